@@ -1,7 +1,19 @@
 import numpy as np
 
 
+def index_dtype(size):
+    """
+    this function finds the narrowest unsigned integer type that can hold indices into an array
+    :param size: the length of the array
+    :return: the numpy type
+    """
+    return np.min_scalar_type(max(size - 1, 0))
+
+
 class Graph:
+    __slots__ = ('degree', 'num_of_nodes', 'num_of_edges', 'neighbors', 'num_of_neighbors', 'is_left', 'A', 'B',
+                 'routing', '_edges', '_incidence')
+
     def __init__(self, num_of_nodes, degree):
         """
         initialization of the graph object
@@ -10,16 +22,51 @@ class Graph:
         """
         self.degree = degree
         self.num_of_nodes = num_of_nodes
-        self.neighbors = np.zeros((num_of_nodes, degree), dtype=int)
+        self.neighbors = np.zeros((num_of_nodes, degree), dtype=index_dtype(num_of_nodes))
 
-        self.num_of_neighbors = [0] * num_of_nodes
-        self.is_left = [False] * num_of_nodes
+        self.num_of_neighbors = np.zeros(num_of_nodes, dtype=index_dtype(degree + 1))
+        self.is_left = np.zeros(num_of_nodes, dtype=bool)
 
         nodes_on_each_side = num_of_nodes // 2
-        self.A = [-1] * nodes_on_each_side
-        self.B = [-1] * nodes_on_each_side
-        self.sets = self.A, self.B
+        self.A = np.zeros(nodes_on_each_side, dtype=self.neighbors.dtype)
+        self.B = np.zeros(nodes_on_each_side, dtype=self.neighbors.dtype)
         self.num_of_edges = nodes_on_each_side * degree
+        self.routing = None  # the permutations of the expander code, computed on the first use
+        self._edges = None  # computed on the first use
+        self._incidence = None  # computed on the first use
+
+    @classmethod
+    def from_arrays(cls, neighbors, A, B):
+        """
+        this function builds a graph from an adjacency matrix and a split to sides that were computed before
+        :param neighbors: matrix of shape (num_of_nodes, degree) holding the neighbors of each node
+        :param A: the nodes of the left side
+        :param B: the nodes of the right side
+        :return: the graph
+        """
+        num_of_nodes, degree = neighbors.shape
+        graph = cls(num_of_nodes, degree)
+        graph.neighbors = neighbors
+        graph.num_of_neighbors[:] = degree  # the graph is full
+        graph.A = A
+        graph.B = B
+        graph.is_left[A] = True
+        return graph
+
+    @property
+    def sets(self):
+        return self.A, self.B
+
+    @property
+    def nbytes(self):
+        """
+        this function computes the memory of the graph, with its edges, incidence and routing if they were computed
+        :return: the number of bytes
+        """
+        arrays = [self.neighbors, self.num_of_neighbors, self.is_left, self.A, self.B, self._edges, self._incidence]
+        if self.routing is not None:
+            arrays.extend(self.routing)
+        return sum(array.nbytes for array in arrays if array is not None)
 
     def add_edge(self, a, b, qr):
         """
@@ -29,12 +76,10 @@ class Graph:
         :param qr: the side of the first node
         :return: None
         """
-        # adding only for 'a' because this function will be called again where a and b are swapped
         self.neighbors[a][self.num_of_neighbors[a]] = b  # setting b as a neighbor of a
-        self.neighbors[b][self.num_of_neighbors[b]] = a  # setting b as a neighbor of a
+        self.neighbors[b][self.num_of_neighbors[b]] = a  # setting a as a neighbor of b
         self.num_of_neighbors[a] += 1  # increase the counter
         self.num_of_neighbors[b] += 1  # increase the counter
-        self.is_left[a] = qr
         self.is_left[a] = not qr
 
     def split_to_sides(self):
@@ -42,22 +87,32 @@ class Graph:
         this function splits the nodes to 2 sides A,B
         :return: None
         """
-        total_counter = 0  # counter_A + counter_B
-        counter_A = counter_B = 0  # the number of nodes in each of the sides
-        while total_counter < self.num_of_nodes:  # if there are nodes
-            if self.is_left[total_counter]:  # check if the current node is on the left side
-                self.A[counter_A] = total_counter  # set the next node of A in the next location
-                counter_A += 1  # update the number of nodes in A
-            else:
-                self.B[counter_B] = total_counter  # set the next node of B in the next location
-                counter_B += 1  # update the number of nodes in B
-            total_counter += 1  # to the next node
-        self.sets = self.A, self.B
+        self.A = np.flatnonzero(self.is_left).astype(self.neighbors.dtype)
+        self.B = np.flatnonzero(~self.is_left).astype(self.neighbors.dtype)
 
     def edges(self):
         """
         this function collects all the edges of the graph
-        :return: list of all the edges
+        :return: read only array of shape (num_of_edges, 2) of all the edges
+        """
+        if self._edges is None:
+            # the edges are all the left side and its neighbors, by the neighbor's slot and then by the left node
+            edges = np.empty((self.num_of_edges, 2), dtype=self.neighbors.dtype)
+            edges[:, 0] = np.tile(self.A, self.degree)
+            edges[:, 1] = self.neighbors[self.A].T.ravel()
+            edges.setflags(write=False)
+            self._edges = edges
+        return self._edges
+
+    def incidence(self):
+        """
+        this function collects the edges of each node, each node gets its edges in the order of the edges list
+        :return: read only array of shape (num_of_nodes, degree) of the indices of the edges of each node
         """
-        # the edges are all the left side and its neighbors
-        return [[i, self.neighbors[i][j]] for j in range(self.degree) for i in self.A]
+        if self._incidence is None:
+            ends = self.edges().ravel()  # the 2 ends of each edge, edge i is in places 2i and 2i+1
+            incidence = (np.argsort(ends, kind='stable') // 2).astype(index_dtype(self.num_of_edges))
+            incidence = incidence.reshape(self.num_of_nodes, self.degree)
+            incidence.setflags(write=False)
+            self._incidence = incidence
+        return self._incidence
@@ -1,5 +1,11 @@
+import contextlib
+import numpy as np
 import parameters
 import main_code
+import stream_code
+import codeword_file
+import codec_plan
+import decode_stats
 
 
 def slice_word(word, k):
@@ -12,16 +18,13 @@ def load_file(path, encoding=False):
     if encoding:
         with open(path, 'rb') as file:
             data = file.read()
+    elif codeword_file.is_codeword_file(path):
+        data = codeword_file.open_codeword_file(path)[1]  # mapped, the blocks are read only when used
     else:
-        data = []
+        # legacy format: the size of the blocks and then the blocks
         with open(path, 'rb') as file:
-            size_bytes = file.read(4)
-            size = int.from_bytes(size_bytes, 'little')
-            while True:
-                block = file.read(size)
-                if not block:
-                    break
-                data.append(list(block))
+            size = int.from_bytes(file.read(4), 'little')
+        data = np.fromfile(path, dtype=np.uint8, offset=4).reshape(-1, size)
     return data
 
 
@@ -36,8 +39,22 @@ def save_file(path, data, encoding=False):
             file.write(data[0])
 
 
+def open_stream(stream, mode):
+    # open a path, or use the stream as is (without closing it)
+    if type(stream) == str:
+        return open(stream, mode)
+    return contextlib.nullcontext(stream)
+
+
+def open_stats(stats):
+    # the statistics to fill, and the function to call with them (if stats is a function and not the statistics)
+    if stats is None or isinstance(stats, decode_stats.DecodeStats):
+        return stats, None
+    return decode_stats.DecodeStats(), stats
+
+
 class LTCode:
-    def __init__(self, epsilon, r, k=0, eps_dist=0.1, r_dist=0.1, prime_limit=200, max_k=15000000):
+    def __init__(self, epsilon, r, k=0, eps_dist=0.1, r_dist=0.1, prime_limit=200, max_k=None):
         """
         a construction for the main class of the package
         Args:
@@ -47,7 +64,7 @@ class LTCode:
             eps_dist: the distance our epsilon can be from the epsilon given
             r_dist: the distance our r can be from the r given
             prime_limit: the max value of primes for the graphs
-            max_k: the max value of code dimension
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
         """
         self.epsilon = epsilon
         self.r = r
@@ -62,18 +79,31 @@ class LTCode:
             self.options = parameters.choose_params(r, epsilon, eps_dist, r_dist, prime_limit,
                                                     max_k)  # get list of options
             self.params = min([i for i in self.options if i[-1] >= k], key=lambda x: x[-1])  # take the minimum k
-            self.ramanujan, self.expander = main_code.init_graphs(*self.params[:4])  # generate the graphs
+            plan = codec_plan.get_plan(self.params)  # the graphs are built once for each parameter set
+            self.ramanujan, self.expander = plan.ramanujan, plan.expander
+
+    def __getstate__(self):
+        # the graphs are not pickled (for example to a worker process), they are taken from the plan cache
+        state = self.__dict__.copy()
+        state['expander'] = state['ramanujan'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.params is not None:
+            plan = codec_plan.get_plan(self.params)
+            self.ramanujan, self.expander = plan.ramanujan, plan.expander
 
     # ---------------------------------------choosing parameters-----------------------------------------------------
 
-    def get_params_list(self, eps_dist=0.1, r_dist=0.1, prime_limit=200, max_k=15000000):
+    def get_params_list(self, eps_dist=0.1, r_dist=0.1, prime_limit=200, max_k=None):
         """
         function for the user if it doesn't want to take the minimal k
     Args:
             eps_dist: how close epsilon can be
             r_dist: how close r can be
             prime_limit: the max value of primes for the graphs
-            max_k: the max value of code dimension
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
 
         Returns:
             list of parameters the user can choose from
@@ -92,12 +122,13 @@ class LTCode:
         """
         choice = self.options[i]
         self.params = choice
-        self.ramanujan, self.expander = main_code.init_graphs(*choice[:4])
+        plan = codec_plan.get_plan(choice)
+        self.ramanujan, self.expander = plan.ramanujan, plan.expander
         return choice
 
     # ---------------------------------------encoding and decoding---------------------------------------------------
 
-    def encode(self, data, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=15000000, output_path=None):
+    def encode(self, data, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=None, output_path=None):
         """
         encoding a word
         1. if we already chose parameters, we will encode according to them
@@ -107,8 +138,8 @@ class LTCode:
             r_dist: the allowed distance from r
             eps_dist: the allowed distance from epsilon
             prime_limit: the max value of primes for the graphs
-            max_k: the max value of code dimension
-            output_path: a path for a file to output the result in
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
+            output_path: a path for a codeword file to output the result in, the codeword is written directly to it
 
         Returns:
             the encoding of the word
@@ -121,9 +152,9 @@ class LTCode:
             # no parameters so we need to choose
             k = len(data)
             params_list = parameters.choose_params(self.r, self.epsilon, r_dist, eps_dist, prime_limit, max_k)
-            params = min([p for p in params_list if p >= k], key=lambda x: x[-1])  # the first k we can encode
-            expander = None
-            ramanujan = None
+            params = min([p for p in params_list if p[-1] >= k], key=lambda x: x[-1])  # the first k we can encode
+            plan = codec_plan.get_plan(params)
+            expander, ramanujan = plan.expander, plan.ramanujan
         else:
             # copy all parameters and graphs
             params = self.params
@@ -132,44 +163,62 @@ class LTCode:
 
         data = bytearray(data)
         if len(data) < params[-1]:  # if we need to pad
-            data += bytearray(self.params[-1] - len(data))
-        codeword = main_code.linear_encode(data, *params[:5], params[6], ramanujan, expander)  # encode
+            data += bytearray(params[-1] - len(data))
+        out = codeword_file.create_codeword_file(output_path, params) if output_path else None
+        codeword = main_code.linear_encode(data, *params[:5], params[6], ramanujan, expander, out)  # encode
         if output_path:
-            save_file(output_path, codeword, True)
+            out.flush()
         return codeword
 
-    def decode(self, data, erase_pos=None, r_dist=0.1, eps_dist=0.1, k=0, prime_limit=200, max_k=15000000,
-               output_path=None):
+    def decode(self, data, erase_pos=None, r_dist=0.1, eps_dist=0.1, k=0, prime_limit=200, max_k=None,
+               output_path=None, workers=1, only_erasures=False, stats=None):
         """
         decoding a codeword
         1. if we already chose parameters, we will decode according to them
         2. if we didn't choose parameters, we choose in the function according to the shape of data
         Args:
             data: the codeword we want to decode, or the path to the file we want to decode
-            erase_pos: the locations of the errors
+            erase_pos: the locations of the errors, by default the erasures saved in the codeword file
             r_dist: if we choose parameters, the allowed distance from r
             eps_dist: if we choose parameters, the allowed distance from epsilon
             k: the length of the word we want to decode to
             prime_limit: the max value of primes for the graphs
-            max_k: the max value of code dimension
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
             output_path: a path for a file to output the result in
+            workers: the number of processes for decoding the blocks, None for the number of cpus
+            only_erasures: True if there are no errors in the codeword, only erasures, for a faster decoding
+            stats: a DecodeStats to fill with the times and the counters of the decoding stages,
+                   or a function to call with them at the end of the decoding
 
         Returns:
             word: the word we decoded to
             flag: indicator if the program went well
         """
+        stats, callback = open_stats(stats)
         # load data if needed
+        file_params = None
         if type(data) == str:
-            data = load_file(data, False)
+            if codeword_file.is_codeword_file(data):
+                file_params, data, file_erasures = codeword_file.open_codeword_file(data)  # mapped, not copied
+                if erase_pos is None and file_erasures is not None:
+                    erase_pos = file_erasures  # boolean mask
+            else:
+                data = load_file(data, False)
 
-        if self.params is None:
+        if file_params is not None and (self.params is None or tuple(self.params) != file_params):
+            # the codeword file knows its parameters
+            params = file_params
+            plan = codec_plan.get_plan(params)
+            expander, ramanujan = plan.expander, plan.ramanujan
+        elif self.params is None:
             # if there are no params, generate them
             n = len(data)  # n blocks
             delta = len(data[0])  # each contains Delta symbols
             # find parameters with same delta and n
-            params_list = parameters.choose_params(self.r, self.epsilon, r_dist, eps_dist, prime_limit, max_k)
-            params = [p for p in params_list if p[2] + 1 == delta and p[3] * (p[3] * p[3] - 1) == n + n][0]
-            expander = ramanujan = None  # set the graphs to be none
+            params = parameters.catalogue(prime_limit).choose(self.r, self.epsilon, r_dist, eps_dist, max_k,
+                                                              shape=(delta, n))[0]
+            plan = codec_plan.get_plan(params)
+            expander, ramanujan = plan.expander, plan.ramanujan
         else:
             # copy all the parameters and graphs
             params = self.params
@@ -180,7 +229,10 @@ class LTCode:
             erase_pos = []
 
         # decode
-        word = main_code.linear_decode(data, *params[:5], params[6], ramanujan, expander, erasures=erase_pos)
+        word = main_code.linear_decode(data, *params[:5], params[6], ramanujan, expander, erasures=erase_pos,
+                                       workers=workers, only_erasures=only_erasures, stats=stats)
+        if callback is not None:
+            callback(stats)
         if k != 0:  # slice the word with k
             word = slice_word(word, k)
         elif self.k != 0:  # slice the word with self.k
@@ -189,6 +241,211 @@ class LTCode:
             save_file(output_path, word, False)
         return word
 
+    def decode_range(self, data, start, stop, erase_pos=None, r_dist=0.1, eps_dist=0.1, prime_limit=200,
+                     max_k=None):
+        """
+        decoding only the bytes start to stop of the message, reading only the parts of the codeword they depend on
+        1. if we already chose parameters, we will decode according to them
+        2. if we didn't choose parameters, we choose in the function according to the shape of data
+        Args:
+            data: the codeword we want to decode, or the path to the file we want to decode
+            start: the first byte of the range
+            stop: the end of the range (not included)
+            erase_pos: the locations of the erasures, by default the erasures saved in the codeword file
+            r_dist: if we choose parameters, the allowed distance from r
+            eps_dist: if we choose parameters, the allowed distance from epsilon
+            prime_limit: the max value of primes for the graphs
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
+
+        Returns:
+            word: the bytes of the range
+            flag: indicator if the program went well
+        """
+        params = self.params
+        if type(data) == str:
+            if codeword_file.is_codeword_file(data):
+                params, data, file_erasures = codeword_file.open_codeword_file(data)  # mapped, not copied
+                if erase_pos is None and file_erasures is not None:
+                    erase_pos = file_erasures
+            else:
+                data = load_file(data, False)
+        if params is None:
+            # find parameters with same delta and n
+            params = parameters.catalogue(prime_limit).choose(self.r, self.epsilon, r_dist, eps_dist, max_k,
+                                                              shape=(len(data[0]), len(data)))[0]
+        if erase_pos is None:
+            erase_pos = []
+        return codec_plan.get_plan(params).decode_range(data, start, stop, erase_pos)
+
+    def update(self, data, offset, new_bytes, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=None):
+        """
+        changing bytes of the message of an intact codeword in place, without encoding the whole message again
+        1. if we already chose parameters, we will encode according to them
+        2. if we didn't choose parameters, we choose in the function according to the shape of data
+        Args:
+            data: the codeword we want to change (an array), or the path to the codeword file we want to change
+            offset: the position of the first byte to change in the message
+            new_bytes: the new bytes
+            r_dist: if we choose parameters, the allowed distance from r
+            eps_dist: if we choose parameters, the allowed distance from epsilon
+            prime_limit: the max value of primes for the graphs
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
+
+        Returns:
+            the changed codeword
+        """
+        params = self.params
+        if type(data) == str:
+            params, data, _ = codeword_file.open_codeword_file(data, 'r+')  # only the changed symbols are written
+        if params is None:
+            # find parameters with same delta and n
+            params = parameters.catalogue(prime_limit).choose(self.r, self.epsilon, r_dist, eps_dist, max_k,
+                                                              shape=(len(data[0]), len(data)))[0]
+        codeword = codec_plan.get_plan(params).update(data, offset, new_bytes)
+        if isinstance(codeword, np.memmap):
+            codeword.flush()
+        return codeword
+
+    def verify(self, data, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=None):
+        """
+        checking if a codeword is intact, without decoding it
+        1. if we already chose parameters, we will check according to them
+        2. if we didn't choose parameters, we choose in the function according to the shape of data
+        Args:
+            data: the codeword we want to check, or the path to the file we want to check
+            r_dist: if we choose parameters, the allowed distance from r
+            eps_dist: if we choose parameters, the allowed distance from epsilon
+            prime_limit: the max value of primes for the graphs
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
+
+        Returns:
+            True if all the blocks of the codeword are intact
+        """
+        params = self.params
+        if type(data) == str:
+            if codeword_file.is_codeword_file(data):
+                params, data, _ = codeword_file.open_codeword_file(data)  # mapped, not copied
+            else:
+                data = load_file(data, False)
+        if params is None:
+            # find parameters with same delta and n
+            params = parameters.catalogue(prime_limit).choose(self.r, self.epsilon, r_dist, eps_dist, max_k,
+                                                              shape=(len(data[0]), len(data)))[0]
+        return codec_plan.get_plan(params).verify(data)
+
+    # ---------------------------------------batches-----------------------------------------------------------------
+
+    def encode_many(self, messages, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=None):
+        """
+        encoding many messages with the same parameters at once
+        1. if we already chose parameters, we will encode according to them
+        2. if we didn't choose parameters, we choose in the function according to the longest message
+        Args:
+            messages: list of the words we want to encode
+            r_dist: the allowed distance from r
+            eps_dist: the allowed distance from epsilon
+            prime_limit: the max value of primes for the graphs
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
+
+        Returns:
+            array of shape (messages, n, delta), the encodings in the order of the messages
+        """
+        if self.params is None:
+            # no parameters so we need to choose
+            k = max(len(message) for message in messages)
+            params_list = parameters.choose_params(self.r, self.epsilon, r_dist, eps_dist, prime_limit, max_k)
+            params = min([p for p in params_list if p[-1] >= k], key=lambda x: x[-1])  # the first k we can encode
+        else:
+            params = self.params
+        return codec_plan.get_plan(params).encode_many(messages)
+
+    def decode_many(self, codewords, erase_pos=None, r_dist=0.1, eps_dist=0.1, k=0, prime_limit=200,
+                    max_k=None, workers=1, only_erasures=False, stats=None):
+        """
+        decoding many codewords with the same parameters at once
+        1. if we already chose parameters, we will decode according to them
+        2. if we didn't choose parameters, we choose in the function according to the shape of the codewords
+        Args:
+            codewords: array of shape (messages, n, delta), or a list of the codewords
+            erase_pos: list of the locations of the erasures in each codeword
+            r_dist: if we choose parameters, the allowed distance from r
+            eps_dist: if we choose parameters, the allowed distance from epsilon
+            k: the length of the words we want to decode to
+            prime_limit: the max value of primes for the graphs
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
+            workers: the number of processes for decoding the blocks, None for the number of cpus
+            only_erasures: True if there are no errors in the codewords, only erasures, for a faster decoding
+            stats: a DecodeStats to fill with the times and the counters of the decoding stages of all the codewords,
+                   or a function to call with them at the end of the decoding
+
+        Returns:
+            list of the words we decoded to and their flags, in the order of the codewords
+        """
+        stats, callback = open_stats(stats)
+        if self.params is None:
+            # find parameters with same delta and n
+            n, delta = len(codewords[0]), len(codewords[0][0])
+            params = parameters.catalogue(prime_limit).choose(self.r, self.epsilon, r_dist, eps_dist, max_k,
+                                                              shape=(delta, n))[0]
+        else:
+            params = self.params
+        words = codec_plan.get_plan(params).decode_many(codewords, erase_pos, workers, only_erasures, stats)
+        if callback is not None:
+            callback(stats)
+        if k == 0:
+            k = self.k
+        return [slice_word(word, k) for word in words]
+
+    # ---------------------------------------streams-----------------------------------------------------------------
+
+    def encode_stream(self, source, destination, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=None):
+        """
+        encoding a stream of any length, in frames of k bytes
+        1. if we already chose parameters, we will encode according to them
+        2. if we didn't choose parameters, we choose the largest k, so there are as few frames as possible
+        Args:
+            source: the path of the file we want to encode, or a binary stream
+            destination: the path of the file to output the container in, or a binary stream
+            r_dist: the allowed distance from r
+            eps_dist: the allowed distance from epsilon
+            prime_limit: the max value of primes for the graphs
+            max_k: the max value of code dimension, None for the defaults of parameters.choose_params
+
+        Returns:
+            the number of frames
+        """
+        if self.params is None:
+            params_list = parameters.choose_params(self.r, self.epsilon, r_dist, eps_dist, prime_limit, max_k)
+            params = max(params_list, key=lambda x: x[-1])
+            ramanujan = expander = None
+        else:
+            params = self.params
+            ramanujan = self.ramanujan
+            expander = self.expander
+        with open_stream(source, 'rb') as reader, open_stream(destination, 'wb') as writer:
+            return stream_code.encode_stream(reader, writer, params, ramanujan, expander)
+
+    def decode_stream(self, source, destination, workers=1):
+        """
+        decoding a container of frames, the parameters are read from the container
+        Args:
+            source: the path of the container, or a binary stream
+            destination: the path of the file to output the message in, or a binary stream
+            workers: the number of processes for decoding the blocks, None for the number of cpus
+
+        Returns:
+            flags: indicator for each frame if the program went well
+        """
+        ramanujan = expander = None
+        with open_stream(source, 'rb') as reader, open_stream(destination, 'wb') as writer:
+            if self.params is not None and reader.seekable():
+                # use our graphs if the container has our parameters
+                position = reader.tell()
+                if stream_code.read_header(reader) == tuple(self.params):
+                    ramanujan, expander = self.ramanujan, self.expander
+                reader.seek(position)
+            return stream_code.decode_stream(reader, writer, ramanujan, expander, workers)
+
     # ---------------------------------------other functions---------------------------------------------------------
 
     def decoding_capability(self, errors=0, erasures=0):
@@ -0,0 +1,127 @@
+import asyncio
+import concurrent.futures
+import functools
+import os
+from LT_code import LTCode
+
+
+class AsyncLTCode:
+    """
+    asyncio interface of LTCode: the encoding and decoding run in an executor, so they don't block the event loop.
+    All the coroutines share the same code (parameters and graphs), and at most max_in_flight calls run or wait in
+    the executor at once, the next calls wait for a free place
+    """
+
+    def __init__(self, code, executor=None, max_in_flight=None):
+        """
+        Args:
+            code: the LTCode to run, or the arguments of LTCode (epsilon, r, k) as a tuple
+            executor: the executor to run the calls in, by default a thread pool owned by this object.
+                      with a process pool the code is pickled without its graphs,
+                      and each process builds the graphs once (from the plan cache)
+            max_in_flight: the max number of calls in the executor at once, by default twice the number of cpus
+        """
+        if isinstance(code, tuple):
+            code = LTCode(*code)
+        self.code = code
+        self._own_executor = executor is None
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(os.cpu_count())
+        self.executor = executor
+        if max_in_flight is None:
+            max_in_flight = 2 * (os.cpu_count() or 1)
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0  # the number of calls in the executor
+
+    async def _run(self, method, *args, **kwargs):
+        """
+        run a method of the code in the executor, after waiting for a free place
+        if the coroutine is cancelled, a call that didn't start is dropped, a call that started runs to the end
+        (it can't be stopped in the middle) and keeps its place until it ends
+        Args:
+            method: the name of the method of LTCode
+            args: the arguments of the method
+            kwargs: the keyword arguments of the method
+
+        Returns:
+            the result of the method
+        """
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.executor.submit(functools.partial(getattr(self.code, method), *args, **kwargs))
+        except BaseException:
+            self._slots.release()
+            raise
+        self.in_flight += 1
+
+        def release(_):
+            # the place is free only when the call left the executor, also if the coroutine was cancelled before
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:  # the loop is closed
+                pass
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    async def encode(self, data, *args, **kwargs):
+        """
+        encoding a word in the executor, with the arguments of LTCode.encode
+        """
+        return await self._run('encode', data, *args, **kwargs)
+
+    async def decode(self, data, *args, **kwargs):
+        """
+        decoding a codeword in the executor, with the arguments of LTCode.decode
+        """
+        return await self._run('decode', data, *args, **kwargs)
+
+    async def decode_range(self, data, start, stop, *args, **kwargs):
+        """
+        decoding a range of the message in the executor, with the arguments of LTCode.decode_range
+        """
+        return await self._run('decode_range', data, start, stop, *args, **kwargs)
+
+    async def update(self, data, offset, new_bytes, *args, **kwargs):
+        """
+        changing bytes of a codeword in the executor, with the arguments of LTCode.update.
+        with a process pool only a codeword file is changed in place, for an array use the returned codeword
+        """
+        return await self._run('update', data, offset, new_bytes, *args, **kwargs)
+
+    async def verify(self, data, *args, **kwargs):
+        """
+        checking a codeword in the executor, with the arguments of LTCode.verify
+        """
+        return await self._run('verify', data, *args, **kwargs)
+
+    async def encode_many(self, messages, *args, **kwargs):
+        """
+        encoding many words in one call in the executor, with the arguments of LTCode.encode_many
+        """
+        return await self._run('encode_many', messages, *args, **kwargs)
+
+    async def decode_many(self, codewords, *args, **kwargs):
+        """
+        decoding many codewords in one call in the executor, with the arguments of LTCode.decode_many
+        """
+        return await self._run('decode_many', codewords, *args, **kwargs)
+
+    def close(self):
+        """
+        shutting down the executor if it is owned by this object, waiting for the calls that started
+        """
+        if self._own_executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,192 @@
+import collections
+import concurrent.futures
+import os
+import threading
+import numpy as np
+from expander_code import routing_plan
+from left_code import vertex_generator_matrix
+from main_code import init_graphs, linear_decode, linear_decode_many, linear_decode_range, linear_encode, \
+    linear_encode_many, linear_update, linear_verify
+from parameters import field_exponent
+from rs_batch import chien_matrix, generator_poly, parity_matrix, syndrome_matrix
+
+PLAN_CACHE_BYTES = int(os.environ.get('LTCODE_PLAN_CACHE_BYTES', 2 ** 30))
+# the caches of the Reed-Solomon matrices, they are bounded by MATRIX_CACHE_SIZE and cleared with the plans
+MATRIX_CACHES = (vertex_generator_matrix, generator_poly, parity_matrix, syndrome_matrix, chien_matrix)
+
+
+class CodecPlan:
+    """
+    Everything the code needs for one parameter set, built once:
+    the graphs with their edges, incidence and routing, which hold all the memory of the plan.
+    The Reed-Solomon matrices depend only on the lengths and the field, they are shared by the plans
+    in the bounded caches of rs_batch and left_code, and are computed here so the first call doesn't pay for them
+    """
+
+    def __init__(self, params, cache_dir=None):
+        """
+        :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+        :param cache_dir: Optional directory of the graph cache
+        """
+        self.params = tuple(params)
+        pr, qr, pe, qe, b, r, epsilon, k = self.params
+        self.ramanujan, self.expander = init_graphs(pr, qr, pe, qe, cache_dir)
+        self.c_exp = field_exponent(pr, pe, epsilon)  # the field of the symbols, 16 for symbols of two bytes
+        self.ramanujan.incidence()  # the incidence and the routing are kept on the graphs
+        routing_plan(self.expander)
+
+        # the matrices of the left code and of the blocks
+        gamma_tag = epsilon / 32
+        d = self.ramanujan.degree
+        rsc1_redundancy = round(gamma_tag * d + 0.5)
+        rsc2_redundancy = int(round(4 * d * gamma_tag) - rsc1_redundancy)
+        vertex_generator_matrix(d, rsc1_redundancy, rsc2_redundancy, self.c_exp)
+        delta = self.expander.degree
+        generator_poly(int(delta - b), self.c_exp)
+        syndrome_matrix(delta, int(delta - b), self.c_exp)
+
+        self.nbytes = self.ramanujan.nbytes + self.expander.nbytes
+
+    def encode(self, message, out=None):
+        """
+        This function encodes a message with the plan, like linear_encode
+        :param message: message of at most k bytes, a shorter message is padded with zeros
+        :param out: Optional array of shape (n, delta) to write the codeword into
+        :return: the codeword
+        """
+        pr, qr, pe, qe, b, r, epsilon, k = self.params
+        if len(message) < k:
+            message = bytes(message) + bytes(k - len(message))
+        return linear_encode(message, pr, qr, pe, qe, b, epsilon, self.ramanujan, self.expander, out)
+
+    def decode(self, codeword, erasures=(), workers=1, only_erasures=False, stats=None):
+        """
+        This function decodes a codeword with the plan, like linear_decode
+        :param codeword: the codeword
+        :param erasures: Optional positions of the erased symbols
+        :param workers: Optional number of processes for the block decoding
+        :param only_erasures: Optional, True if there are no errors, only the erasures are filled
+        :param stats: Optional DecodeStats to fill
+        :return: the decoded word and a flag if we think it was decoded successfully
+        """
+        pr, qr, pe, qe, b, r, epsilon, k = self.params
+        return linear_decode(codeword, pr, qr, pe, qe, b, epsilon, self.ramanujan, self.expander, erasures, workers,
+                             only_erasures, stats)
+
+    def decode_range(self, codeword, start, stop, erasures=()):
+        """
+        This function decodes only a range of the message with the plan, like linear_decode_range
+        :param codeword: the codeword
+        :param start: the first byte of the range in the message
+        :param stop: the end of the range in the message (not included)
+        :param erasures: Optional positions of the erased symbols
+        :return: the bytes of the range and a flag if we think they were decoded successfully
+        """
+        pr, qr, pe, qe, b, r, epsilon, k = self.params
+        return linear_decode_range(codeword, start, stop, pr, qr, pe, qe, b, epsilon, self.ramanujan, self.expander,
+                                   erasures)
+
+    def update(self, codeword, offset, new_bytes):
+        """
+        This function changes bytes of the message in an intact codeword with the plan, like linear_update
+        :param codeword: the codeword to change in place
+        :param offset: the position of the first byte to change in the message
+        :param new_bytes: the new bytes
+        :return: the codeword
+        """
+        pr, qr, pe, qe, b, r, epsilon, k = self.params
+        return linear_update(codeword, offset, new_bytes, pr, qr, pe, qe, b, epsilon, self.ramanujan, self.expander)
+
+    def verify(self, codeword):
+        """
+        This function checks if a codeword is intact with the plan, like linear_verify
+        :param codeword: the codeword
+        :return: True if all the blocks are codewords
+        """
+        pr, qr, pe, qe, b, r, epsilon, k = self.params
+        return linear_verify(codeword, pe, qe, b, self.expander, self.c_exp)
+
+    def encode_many(self, messages):
+        """
+        This function encodes many messages at once with the plan, like linear_encode_many
+        :param messages: list of messages of at most k bytes, the shorter messages are padded with zeros
+        :return: array of shape (messages, n, delta), the codewords in the order of the messages
+        """
+        pr, qr, pe, qe, b, r, epsilon, k = self.params
+        stacked = np.zeros((len(messages), k), dtype=np.uint8)
+        for row, message in zip(stacked, messages):
+            message = np.frombuffer(bytes(message), dtype=np.uint8)
+            row[:len(message)] = message
+        return linear_encode_many(stacked, pr, qr, pe, qe, b, epsilon, self.ramanujan, self.expander)
+
+    def decode_many(self, codewords, erasures=None, workers=1, only_erasures=False, stats=None):
+        """
+        This function decodes many codewords at once with the plan, like linear_decode_many
+        :param codewords: array of shape (messages, n, delta), or a list of codewords
+        :param erasures: Optional list with the positions of the erased symbols of each codeword
+        :param workers: Optional number of processes for the block decoding
+        :param only_erasures: Optional, True if there are no errors, only the erasures are filled
+        :param stats: Optional DecodeStats to fill, for all the codewords together
+        :return: list of the decoded words and flags, in the order of the codewords
+        """
+        pr, qr, pe, qe, b, r, epsilon, k = self.params
+        return linear_decode_many(codewords, pr, qr, pe, qe, b, epsilon, self.ramanujan, self.expander, erasures,
+                                  workers, only_erasures, stats)
+
+
+_plans = collections.OrderedDict()  # the plans by their parameters, the least recently used first
+_building = {}  # the futures of the plans that are being built, by their parameters
+_plans_lock = threading.Lock()  # held only for the dictionaries, a plan is built outside of it
+
+
+def get_plan(params, cache_dir=None, max_bytes=PLAN_CACHE_BYTES):
+    """
+    This function returns the plan of a parameter set from the process-wide cache, it is built on the first use.
+    A plan is built by the first thread that asks for it, the other threads that ask for it wait for that build,
+    and the threads that ask for other plans are not blocked.
+    The least recently used plans are dropped when the plans take more than max_bytes, except for the newest plan
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :param cache_dir: Optional directory of the graph cache
+    :param max_bytes: the maximal memory of the cached plans
+    :return: the plan
+    """
+    key = tuple(params)
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+        future = _building.get(key)
+        builder = future is None
+        if builder:
+            future = _building[key] = concurrent.futures.Future()
+    if not builder:
+        return future.result()  # another thread is building it, its error is raised here too
+
+    try:
+        plan = CodecPlan(key, cache_dir)
+    except BaseException as error:
+        with _plans_lock:
+            del _building[key]
+        future.set_exception(error)
+        raise
+    with _plans_lock:
+        del _building[key]
+        _plans[key] = plan
+        total = sum(cached.nbytes for cached in _plans.values())
+        while total > max_bytes and len(_plans) > 1:
+            _, dropped = _plans.popitem(last=False)
+            total -= dropped.nbytes
+    future.set_result(plan)
+    return plan
+
+
+def clear_plans():
+    """
+    This function drops all the cached plans, and the Reed-Solomon matrices they use
+    :return: None
+    """
+    with _plans_lock:
+        _plans.clear()
+    for cache in MATRIX_CACHES:
+        cache.cache_clear()
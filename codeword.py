@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class Codeword(np.ndarray):
+    """
+    A codeword of n symbols, each of delta field elements, backed by one contiguous buffer.
+    The elements are bytes (uint8), or two bytes (little endian uint16) in the wide mode.
+    It is a numpy array of shape (n, delta), so it supports the buffer protocol and is passed to the decoder as is
+    """
+
+    def __new__(cls, data, delta=None, dtype=np.uint8):
+        """
+        This function views data as a codeword, the data is copied only if it is not a contiguous buffer of the type
+        :param data: a buffer (bytes, bytearray, memoryview, array) or a matrix of the symbols
+        :param delta: the size of each symbol, needed if data is flat
+        :param dtype: Optional type of the field elements, uint8 or uint16
+        :return: the codeword
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            array = np.frombuffer(data, dtype=dtype)
+        else:
+            array = np.asarray(data, dtype=dtype)
+        if delta is not None:
+            array = array.reshape(-1, delta)
+        if array.ndim != 2:
+            raise ValueError("A codeword must be a matrix of n symbols of delta elements")
+        return np.ascontiguousarray(array).view(cls)
+
+    @property
+    def n(self):
+        return self.shape[0]
+
+    @property
+    def delta(self):
+        return self.shape[1]
+
+    def symbol(self, i):
+        """
+        This function returns the i'th symbol without copying it
+        :param i: the index of the symbol
+        :return: memoryview of the symbol
+        """
+        return memoryview(self[i].view(np.ndarray))
+
+    def symbols(self):
+        """
+        This function returns all the symbols without copying them
+        :return: generator of memoryviews of the symbols
+        """
+        return (self.symbol(i) for i in range(self.n))
@@ -0,0 +1,115 @@
+import struct
+import numpy as np
+from parameters import field_exponent
+from rs_batch import symbol_dtype
+
+MAGIC = b'LTCW'
+FORMAT_VERSION = 1
+# magic, format version, whether there is an erasure bitmap, the parameters (pr, qr, pe, qe, b, r, epsilon, k),
+# the number of symbols n and the size of each symbol delta
+HEADER = struct.Struct('<4sHHIIIIIddQQI')
+ALIGNMENT = 64  # the bitmap and the body start on aligned offsets
+
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def layout(n):
+    """
+    This function computes the offsets of the parts of the file
+    :param n: the number of symbols in the codeword
+    :return: the offset of the erasure bitmap and of the body
+    """
+    bitmap_offset = aligned(HEADER.size)
+    return bitmap_offset, aligned(bitmap_offset + (n + 7) // 8)
+
+
+def params_dtype(params):
+    """
+    This function finds the type of the elements of the codewords of the parameters
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :return: uint8, or little endian uint16 for the wide symbols
+    """
+    return np.dtype(symbol_dtype(field_exponent(params[0], params[2], params[6])))
+
+
+def erasure_mask(erasures, n):
+    """
+    This function converts erasures to a boolean mask
+    :param erasures: list of indices of erased symbols, or a boolean mask
+    :param n: the number of symbols in the codeword
+    :return: boolean mask of length n
+    """
+    erasures = np.asarray(erasures)
+    if erasures.dtype == bool:
+        return erasures
+    mask = np.zeros(n, dtype=bool)
+    mask[erasures.astype(np.intp)] = True
+    return mask
+
+
+def create_codeword_file(path, params, erasures=None):
+    """
+    This function creates a codeword file and maps its body, so the encoder can write the codeword directly to it
+    :param path: the path of the file
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :param erasures: optional erasures of the codeword to save in the file
+    :return: the mapped body, of shape (n, delta)
+    """
+    qe, delta = params[3], params[2] + 1
+    n = qe * (qe * qe - 1) // 2  # number of symbols, the nodes on each side of the expander
+    dtype = params_dtype(params)
+    bitmap_offset, body_offset = layout(n)
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, erasures is not None, *params, n, delta))
+        if erasures is not None:
+            file.seek(bitmap_offset)
+            file.write(np.packbits(erasure_mask(erasures, n), bitorder='little').tobytes())
+        file.truncate(body_offset + n * delta * dtype.itemsize)
+    return np.memmap(path, dtype=dtype, mode='r+', offset=body_offset, shape=(n, delta))
+
+
+def save_codeword(path, codeword, params, erasures=None):
+    """
+    This function saves a codeword to a codeword file
+    :param path: the path of the file
+    :param codeword: the codeword, a matrix of shape (n, delta)
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :param erasures: optional erasures of the codeword to save in the file
+    :return: None
+    """
+    body = create_codeword_file(path, params, erasures)
+    body[:] = codeword
+    body.flush()
+
+
+def is_codeword_file(path):
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def open_codeword_file(path, mode='r'):
+    """
+    This function maps the body of a codeword file without reading it
+    :param path: the path of the file
+    :param mode: the mode of the mapping, 'r' for read only or 'r+' to change the codeword
+    :return: params - the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+             codeword - the mapped body, of shape (n, delta)
+             erasures - boolean mask of the erased symbols, None if the file has no erasure bitmap
+    """
+    with open(path, 'rb') as file:
+        header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("The file is too short for a codeword file header")
+        magic, version, has_erasures, *params, n, delta = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("The file is not a codeword file of version %i" % FORMAT_VERSION)
+        bitmap_offset, body_offset = layout(n)
+        erasures = None
+        if has_erasures:
+            file.seek(bitmap_offset)
+            bitmap = np.frombuffer(file.read((n + 7) // 8), dtype=np.uint8)
+            erasures = np.unpackbits(bitmap, count=n, bitorder='little').astype(bool)
+    codeword = np.memmap(path, dtype=params_dtype(params), mode=mode, offset=body_offset, shape=(n, delta))
+    return tuple(params), codeword, erasures
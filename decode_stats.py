@@ -0,0 +1,71 @@
+import contextlib
+import time
+
+STAGES = ('expander', 'blocks', 'split', 'check_symbols', 'vertices')
+
+
+class DecodeStats:
+    """
+    Statistics of a decoding: the time of each stage and counters of what happened in it.
+    A decoding fills it only when it is given one, so the decoding is not slowed down when it isn't.
+    The counters add up when the same object is given to many decodings
+    """
+
+    def __init__(self):
+        self.times = dict.fromkeys(STAGES, 0.0)  # seconds in each stage
+        self.codewords = 0  # codewords decoded
+        self.clean_codewords = 0  # codewords that were intact, so the stages after the expander were skipped
+        self.blocks = 0  # blocks decoded with rsc3
+        self.blocks_failed = 0  # blocks rsc3 couldn't decode
+        self.block_symbols_corrected = 0  # symbols of the blocks changed by rsc3
+        self.check_symbols = 0  # vertices whose check symbols were decoded with rsc2
+        self.check_symbols_failed = 0  # vertices rsc2 couldn't decode, or that were cut at the end of the word
+        self.check_symbols_corrected = 0  # check symbols changed by rsc2
+        self.vertex_attempts = 0  # vertex decodings with rsc1
+        self.vertex_successes = 0  # vertex decodings that succeeded
+        self.vertex_symbols_corrected = 0  # symbols of the word changed by rsc1
+        self.rounds = 0  # rounds of the vertex loop
+        self.queue_sizes = []  # the number of vertices in the worklist at the start of each round
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        This function adds the time of the block of code in it to a stage
+        :param name: the name of the stage
+        """
+        start_time = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.times[name] += time.perf_counter() - start_time
+
+    @property
+    def symbols_corrected(self):
+        return self.block_symbols_corrected + self.check_symbols_corrected + self.vertex_symbols_corrected
+
+    def as_dict(self):
+        """
+        This function exports the statistics as a flat dictionary of numbers, for a metrics system
+        :return: the dictionary, the times are in seconds
+        """
+        stats = {'time_' + name: seconds for name, seconds in self.times.items()}
+        stats.update((name, value) for name, value in vars(self).items() if isinstance(value, int))
+        stats['symbols_corrected'] = self.symbols_corrected
+        stats['queue_size_max'] = max(self.queue_sizes, default=0)
+        stats['queue_size_total'] = sum(self.queue_sizes)
+        return stats
+
+    def __repr__(self):
+        return f"DecodeStats({self.as_dict()})"
+
+
+def stage(stats, name):
+    """
+    This function times a stage if there are statistics to fill
+    :param stats: the statistics, or None
+    :param name: the name of the stage
+    :return: context manager of the stage
+    """
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.stage(name)
@@ -1,68 +1,77 @@
-from LinkedList import LinkedList
+import numpy as np
+from Graph import index_dtype
 
 
-def encode_expander(graph, blocks):
+def route(graph, sources, targets):
     """
-    This function sends the data from the left side of the bipartite graph to the right
+    This function computes where each symbol goes when the nodes of one side send their symbols to the other side.
+    Each source node sends its j-th symbol to its j-th neighbor (by sorted order), which saves it in its next empty slot
     :param graph: expander Ramanujan graph
-    :param blocks: data to encode, each block is sent via one node
-    :return: encoded data (changes the order of blocks)
+    :param sources: the nodes sending the symbols, in the order of their blocks
+    :param targets: the nodes receiving the symbols, in the order of their blocks
+    :return: gather index - the position of the j-th received symbol of the i-th target is index[i * delta + j]
     """
-    # graph info
-    delta = graph.degree  # graph is delta regular
-    n = graph.num_of_nodes
-    left, right = graph.sets
+    rank = np.zeros(graph.num_of_nodes, dtype=np.intp)  # the block of each target node
+    rank[np.asarray(targets)] = np.arange(len(targets))
+    receivers = rank[np.sort(graph.neighbors[np.asarray(sources)], axis=1)].ravel()
+    # a stable sort by the receiving block keeps the symbols of each block in the order they were sent
+    index = np.argsort(receivers, kind='stable')
+    return index.astype(index_dtype(len(index)))
+
 
-    mid_codeword = [[0] * delta for _ in range(n)]  # initializing the n new symbols
-    counters = [0] * n  # the next empty slot on each symbol
+def routing_plan(graph):
+    """
+    This function computes the permutations of the expander code only once and keeps them on the graph
+    :param graph: expander Ramanujan graph
+    :return: the gather index of the encoding (left to right) and of the decoding (right to left)
+    """
+    if graph.routing is None:
+        left, right = graph.sets
+        graph.routing = route(graph, left, right), route(graph, right, left)
+    return graph.routing
 
-    # goes through the left nodes, and saves the data in the order of the graph
-    for i in range(n // 2):
-        neighbors_of_i = sorted(graph.neighbors[left[i]])
-        for j in range(delta):
-            k = counters[neighbors_of_i[j]]  # the next empty slot in the block on the left side
-            mid_codeword[neighbors_of_i[j]][k] = blocks[i][j]  # transmitting the symbol
-            counters[neighbors_of_i[j]] += 1
 
-    # take only the left nodes
-    final_codeword = [mid_codeword[r] for r in right]
-    return final_codeword
+def encode_expander(graph, blocks, out=None):
+    """
+    This function sends the data from the left side of the bipartite graph to the right
+    :param graph: expander Ramanujan graph
+    :param blocks: data to encode, each block is sent via one node, can have leading axes for many messages,
+                   the symbols keep their type (uint8, or uint16 for the wide symbols)
+    :param out: optional array of shape (..., n, delta) to write the encoded data into
+    :return: encoded data (changes the order of blocks)
+    """
+    encode_index, _ = routing_plan(graph)
+    blocks = np.asarray(blocks)
+    lead = blocks.shape[:-2]
+    blocks = blocks.reshape(lead + (-1,))
+    if out is None:
+        out = np.empty(lead + (len(encode_index) // graph.degree, graph.degree), dtype=blocks.dtype)
+    np.take(blocks, encode_index, axis=-1, out=out.reshape(lead + (-1,)))  # take only the right nodes
+    return out
 
 
 def decode_expander(graph, new_symbols, erasures):
     """
     This function sends the data from the right side of the bipartite graph to the left
     :param graph: expander Ramanujan graph
-    :param new_symbols: data to decode, each block is sent via one node
-    :param erasures: a list of indices to what symbols are erased
-    :return: decoded data (changes the order of blocks)
+    :param new_symbols: data to decode, each block is sent via one node, can have leading axes for many messages,
+                        the symbols keep their type (uint8, or uint16 for the wide symbols)
+    :param erasures: a list of indices to what symbols are erased, or a boolean mask of shape (..., n)
+    :return: decoded data (changes the order of blocks), and a boolean mask of the erased symbols in the blocks
     """
-    # graph info
     delta = graph.degree  # graph is delta regular
-    n = graph.num_of_nodes
-    left, right = graph.sets
+    _, decode_index = routing_plan(graph)
+    new_symbols = np.asarray(new_symbols)
+    lead = new_symbols.shape[:-2]
+    new_symbols = new_symbols.reshape(lead + (-1,))
 
     # a simpler way to check if an erasure occurred, boolean masking
-    boolean_erasures = [False] * (n // 2)
-    for s in erasures:
-        boolean_erasures[s] = True
-
-    new_erasures = [LinkedList() for _ in range(n)]  # for each node to create a linked list for its erasures
-    blocks = [[0] * delta for _ in range(n)]  # initialize the blocks to return
-    counters = [0] * n  # counts how many symbols in left side has been updated, holds the next empty slot in the block
-
-    # goes through the right nodes, and saves the data in the order of the graph
-    for i in range(n // 2):  # run over all elements on the right size
-        neighbors_of_i = sorted(graph.neighbors[right[i]])
-        for j in range(delta):
-            k = counters[neighbors_of_i[j]]  # the next empty slot in the block on the left side
-            blocks[neighbors_of_i[j]][k] = new_symbols[i][j]  # transmitting the symbol
-            counters[neighbors_of_i[j]] += 1
-            # if an erasure occurred in the right symbol, set the symbol on the left as an erasure
-            if boolean_erasures[i]:
-                new_erasures[neighbors_of_i[j]].insertAtBegin(k)
+    boolean_erasures = np.asarray(erasures)
+    if boolean_erasures.dtype != bool:
+        boolean_erasures = np.zeros(graph.num_of_nodes // 2, dtype=bool)
+        boolean_erasures[np.asarray(erasures, dtype=np.intp)] = True
+    # if an erasure occurred in the right symbol, the symbol on the left is an erasure
+    new_erasures = np.repeat(boolean_erasures, delta, axis=-1)[..., decode_index].reshape(lead + (-1, delta))
 
-    # take only the left nodes
-    original_word = [blocks[l] for l in left]
-    list_new_erasures = [list(new_erasures[left[i]].run_over()) for i in range(n // 2)]
-    return original_word, list_new_erasures
+    original_word = new_symbols[..., decode_index].reshape(lead + (-1, delta))  # take only the left nodes
+    return original_word, new_erasures
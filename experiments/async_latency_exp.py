@@ -0,0 +1,61 @@
+import asyncio
+import concurrent.futures
+import time
+import numpy as np
+from LT_code import LTCode
+from async_code import AsyncLTCode
+
+MESSAGE_LENGTH = 80000
+NUM_OF_CALLS = 8  # decodes running at once
+TICK = 0.005  # the interval of the ticker, its lateness is the latency of the event loop
+
+
+async def ticker(lateness, stop):
+    # sleep for TICK again and again, and measure how late the loop wakes us up
+    while not stop.is_set():
+        start_time = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lateness.append(time.perf_counter() - start_time - TICK)
+
+
+async def run(name, decode_all):
+    lateness = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lateness, stop))
+    await asyncio.sleep(0.05)
+    start_time = time.perf_counter()
+    await decode_all()
+    total = time.perf_counter() - start_time
+    stop.set()
+    await tick
+    lateness = np.array(lateness) * 1000
+    print(f"{name}: {total:.2f}s for {NUM_OF_CALLS} decodes, event loop latency "
+          f"mean {lateness.mean():.1f}ms, p99 {np.percentile(lateness, 99):.1f}ms, max {lateness.max():.1f}ms")
+
+
+async def main():
+    ltc = LTCode(0.2, 0.7, MESSAGE_LENGTH)
+    rng = np.random.default_rng(0)
+    codeword = ltc.encode(rng.integers(0, 256, MESSAGE_LENGTH, dtype=np.uint8).tobytes())
+    corrupted = codeword.copy()
+    errors = rng.random(corrupted.shape) < 0.02 / corrupted.shape[1]
+    corrupted[errors] ^= rng.integers(1, 256, errors.sum(), dtype=np.uint8)
+
+    async def blocking():
+        # the synchronous call, straight from the event loop
+        for _ in range(NUM_OF_CALLS):
+            ltc.decode(corrupted)
+            await asyncio.sleep(0)
+
+    await run("synchronous", blocking)
+
+    for name, executor in (("threads", concurrent.futures.ThreadPoolExecutor(4)),
+                           ("processes", concurrent.futures.ProcessPoolExecutor(4))):
+        async with AsyncLTCode(ltc, executor, max_in_flight=4) as altc:
+            await altc.verify(codeword)  # warm up the workers
+            await run(name, lambda: asyncio.gather(*(altc.decode(corrupted) for _ in range(NUM_OF_CALLS))))
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
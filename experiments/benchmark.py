@@ -0,0 +1,179 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from expander_code import decode_expander, encode_expander
+from left_code import decode_ramanujan, encode_ramanujan
+from main_code import init_graphs, linear_decode, linear_encode
+from parameters import choose_params
+from rs_batch import rs_decode_batch, rs_encode_batch
+
+RESULTS_VERSION = 1
+# fixed parameter sets from small to large k, each is the first row of choose_params(r, epsilon) with the k,
+# so the benchmark times the same codes that the users get
+PARAM_QUERIES = [(0.5, 0.4, 80808), (0.6, 0.35, 98280), (0.75, 0.2, 163800), (0.6, 0.2, 3788400)]
+PARAMS = [next(params for params in choose_params(r, epsilon) if params[-1] == k) for r, epsilon, k in PARAM_QUERIES]
+FRACTION_OF_ERRORS = 0.01  # fraction of the blocks with an error in the decoding stages
+SEED = 0
+
+
+def stages(params):
+    """
+    This function prepares the inputs of every stage for one parameter set, the stages are timed separately
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :return: list of the names of the stages and functions that run them
+    """
+    pr, qr, pe, qe, b, r, epsilon, k = params
+    ramanujan_graph, expander_graph = init_graphs(pr, qr, pe, qe)
+    n = expander_graph.num_of_nodes // 2
+    delta = expander_graph.degree
+    gamma = epsilon / 4
+    d = ramanujan_graph.degree
+    N = ramanujan_graph.num_of_nodes // 2
+    half_gamma_d = round(gamma * d + 0.5) // 2
+
+    rng = np.random.default_rng(SEED)
+    message = rng.integers(0, 256, k, dtype=np.uint8)
+
+    # the input of every encoding stage
+    left_encoded = encode_ramanujan(ramanujan_graph, message, gamma / 8)
+    blocks = np.zeros((n, b), dtype=np.uint8)
+    word_length = min(len(left_encoded), n * b)
+    blocks.reshape(-1)[:word_length] = left_encoded[:word_length]
+    encoded_blocks = rs_encode_batch(blocks, delta - b)
+    codeword = encode_expander(expander_graph, encoded_blocks)
+
+    # the input of every decoding stage, with an error in a few of the blocks
+    corrupted = codeword.copy()
+    errors = rng.random(corrupted.shape) < FRACTION_OF_ERRORS / delta
+    corrupted[errors] ^= rng.integers(1, 256, errors.sum(), dtype=np.uint8)
+    routed, erasures = decode_expander(expander_graph, corrupted, [])
+    decoded_blocks, _, _ = rs_decode_batch(routed, delta - b, erasures)
+    word = decoded_blocks[:, :b].reshape(-1)
+
+    def build_graphs():
+        with tempfile.TemporaryDirectory() as cache_dir:  # an empty cache, so the graphs are built
+            init_graphs(pr, qr, pe, qe, cache_dir)
+
+    def split():
+        return word[:k], [word[k + half_gamma_d * i: k + half_gamma_d * (i + 1)] for i in range(2 * N)]
+
+    split_word = split()
+    return [
+        ('graph_construction', build_graphs),
+        ('graph_load', lambda: init_graphs(pr, qr, pe, qe)),
+        ('encode_left', lambda: encode_ramanujan(ramanujan_graph, message, gamma / 8)),
+        ('encode_blocks', lambda: rs_encode_batch(blocks, delta - b)),
+        ('encode_expander', lambda: encode_expander(expander_graph, encoded_blocks)),
+        ('encode', lambda: linear_encode(message, pr, qr, pe, qe, b, epsilon, ramanujan_graph, expander_graph)),
+        ('decode_expander', lambda: decode_expander(expander_graph, corrupted, [])),
+        ('decode_blocks', lambda: rs_decode_batch(routed, delta - b, erasures)),
+        ('decode_split', split),
+        ('decode_left', lambda: decode_ramanujan(ramanujan_graph, split_word, gamma / 8)),
+        ('decode', lambda: linear_decode(corrupted, pr, qr, pe, qe, b, epsilon, ramanujan_graph, expander_graph)),
+    ]
+
+
+def measure(function, repeat, warmup):
+    """
+    This function times a stage, and measures its peak memory in a separate run (tracemalloc slows it down)
+    :param function: the stage
+    :param repeat: the number of timed runs
+    :param warmup: the number of runs before the timed runs
+    :return: dictionary of the times and the peak memory
+    """
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'min': min(times), 'median': statistics.median(times), 'mean': statistics.fmean(times),
+            'times': times, 'peak_bytes': peak}
+
+
+def run(args):
+    params_list = PARAMS if args.max_k is None else [p for p in PARAMS if p[-1] <= args.max_k]
+    results = []
+    for params in params_list:
+        print(params, file=sys.stderr)
+        result = {'params': list(params), 'stages': {}}
+        for name, function in stages(params):
+            if args.stages and name not in args.stages:
+                continue
+            result['stages'][name] = measure(function, args.repeat, args.warmup)
+            print(f"  {name}: median {result['stages'][name]['median']:.4f}s, "
+                  f"peak {result['stages'][name]['peak_bytes'] / 2 ** 20:.1f}MB", file=sys.stderr)
+        results.append(result)
+    output = {
+        'version': RESULTS_VERSION,
+        'machine': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                    'processor': platform.processor()},
+        'repeat': args.repeat,
+        'warmup': args.warmup,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=1)
+    else:
+        json.dump(output, sys.stdout, indent=1)
+
+
+def compare(args):
+    """
+    compare the median times of two result files, a stage is a regression if it is slower by more than the threshold
+    """
+    with open(args.old) as f:
+        old = {tuple(result['params']): result['stages'] for result in json.load(f)['results']}
+    with open(args.new) as f:
+        new = {tuple(result['params']): result['stages'] for result in json.load(f)['results']}
+    regressions = 0
+    for params in old:
+        if params not in new:
+            continue
+        print(params)
+        for name, old_stage in old[params].items():
+            if name not in new[params]:
+                continue
+            ratio = new[params][name]['median'] / old_stage['median']
+            regression = ratio > 1 + args.threshold
+            regressions += regression
+            print(f"  {name:20} {old_stage['median']:9.4f}s -> {new[params][name]['median']:9.4f}s  "
+                  f"x{ratio:.2f}{'  REGRESSION' if regression else ''}")
+    print(f"{regressions} regressions beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark of the stages of the code')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmark and write the results as JSON')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--warmup', type=int, default=1)
+    run_parser.add_argument('--max-k', type=int, default=None, help='only the parameter sets up to this k')
+    run_parser.add_argument('--stages', nargs='*', default=None, help='only these stages')
+    run_parser.add_argument('--output', '-o', default=None, help='the JSON file, by default the standard output')
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='the allowed slowdown, 0.1 is 10%%')
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import time
+import numpy as np
+from explicit_ramanujan_construction import find_i, find_S, generate_cayley_graph, generate_cayley_graph_loop
+
+GRAPHS = [(89, 13), (149, 13), (109, 17), (137, 29), (97, 37)]  # (p, q) pairs with legendre symbol -1
+
+
+def time_construction(construct, p, q):
+    """
+    This function measures the time of building the cayley graph with the given construction
+    """
+    elements = find_S(find_i(q), p, q)
+    start_time = time.time()
+    graph = construct(elements, q, p)
+    stop_time = time.time()
+    graph.split_to_sides()
+    return graph, stop_time - start_time
+
+
+def main():
+    for p, q in GRAPHS:
+        loop_graph, loop_time = time_construction(generate_cayley_graph_loop, p, q)
+        graph, array_time = time_construction(generate_cayley_graph, p, q)
+        same = all(np.array_equal(a, b) for a, b in zip((loop_graph.neighbors, *loop_graph.sets),
+                                                        (graph.neighbors, *graph.sets)))
+        print(f"p={p}, q={q}: {graph.num_of_edges} edges, loop {loop_time:.3f}s, arrays {array_time:.3f}s, "
+              f"speedup x{loop_time / array_time:.1f}, same graph: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import os
+import time
+import numpy as np
+import parameters
+from expander_code import decode_expander
+from main_code import init_graphs, linear_encode
+from parallel import rs_decode_parallel
+
+FRACTION_OF_ERRORS = 0.1  # fraction of the codeword symbols with an error
+
+
+def main():
+    params = min(parameters.choose_params(0.6, 0.2, 0.2, 0.2), key=lambda x: abs(x[-1] - 1500000))
+    pr, qr, pe, qe, b, r, epsilon, k = params
+    print(params)
+    ramanujan_graph, expander_graph = init_graphs(pr, qr, pe, qe)
+    rng = np.random.default_rng(0)
+    message = rng.integers(0, 256, k, dtype=np.uint8).tobytes()
+    codeword = linear_encode(message, pr, qr, pe, qe, b, epsilon, ramanujan_graph, expander_graph)
+
+    # errors in random symbols of the codeword
+    corrupted = codeword.copy()
+    errors = rng.random(corrupted.shape) < FRACTION_OF_ERRORS / corrupted.shape[1]
+    corrupted[errors] ^= rng.integers(1, 256, errors.sum(), dtype=np.uint8)
+    blocks, erasures = decode_expander(expander_graph, corrupted, [])
+
+    results = []
+    for workers in range(1, os.cpu_count() + 1):
+        start_time = time.time()
+        decoded, success = rs_decode_parallel(blocks, pe + 1 - b, erasures, workers)
+        stop_time = time.time()
+        results.append((decoded, success))
+        same = np.array_equal(decoded, results[0][0]) and np.array_equal(success, results[0][1])
+        print(f"{workers} workers: {stop_time - start_time:.3f}s, {len(blocks)} blocks, "
+              f"{np.count_nonzero(~success)} failed, same as 1 worker: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import os
+import time
+import numpy as np
+import parameters
+from expander_code import decode_expander
+from left_code import decode_ramanujan
+from main_code import init_graphs, linear_encode
+from rs_batch import rs_decode_batch
+
+FRACTION_OF_ERRORS = 0.003  # fraction of the word symbols with an error
+
+
+def main():
+    params = min(parameters.choose_params(0.6, 0.2, 0.2, 0.2), key=lambda x: abs(x[-1] - 1500000))
+    pr, qr, pe, qe, b, r, epsilon, k = params
+    print(params)
+    ramanujan_graph, expander_graph = init_graphs(pr, qr, pe, qe)
+    rng = np.random.default_rng(0)
+    message = rng.integers(0, 256, k, dtype=np.uint8).tobytes()
+    codeword = linear_encode(message, pr, qr, pe, qe, b, epsilon, ramanujan_graph, expander_graph)
+
+    # the word after the block decoding, with errors in random symbols of the word
+    blocks, erasures = decode_expander(expander_graph, codeword, [])
+    blocks, _, _ = rs_decode_batch(blocks, pe + 1 - b, erasures)
+    word = blocks[:, :b].reshape(-1).copy()
+    m = ramanujan_graph.num_of_edges
+    errors = rng.random(m) < FRACTION_OF_ERRORS
+    word[:m][errors] ^= rng.integers(1, 256, errors.sum(), dtype=np.uint8)
+    half_gamma_d = round(epsilon / 4 * ramanujan_graph.degree + 0.5) // 2
+    split = (word[:m], [word[m + half_gamma_d * i: m + half_gamma_d * (i + 1)]
+                        for i in range(ramanujan_graph.num_of_nodes)])
+
+    results = []
+    for workers in range(1, os.cpu_count() + 1):
+        start_time = time.time()
+        result = decode_ramanujan(ramanujan_graph, split, epsilon / 32, workers=workers)
+        stop_time = time.time()
+        results.append(result)
+        print(f"{workers} workers: {stop_time - start_time:.3f}s, success {result[1]}, "
+              f"same as 1 worker: {result == results[0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import time
+import numpy as np
+from reedsolo import ReedSolomonError, RSCodec
+from rs_batch import rs_decode_batch, rs_encode_batch
+
+NUM_OF_ROWS = 1092
+LENGTH = 255
+NSYM = 32
+FRACTION_OF_ERASED_ROWS = 0.3  # fraction of the rows with erasures
+
+
+def main():
+    # codewords with errors and erasures in every row, up to and beyond what can be corrected
+    rng = np.random.default_rng(0)
+    messages = rng.integers(0, 256, (NUM_OF_ROWS, LENGTH - NSYM), dtype=np.uint8)
+    codewords = rs_encode_batch(messages, NSYM)
+    received = codewords.copy()
+    erasures = np.zeros(received.shape, dtype=bool)
+    for row, erased in zip(received, erasures):
+        num_of_erasures = rng.integers(1, NSYM // 2) if rng.random() < FRACTION_OF_ERASED_ROWS else 0
+        num_of_errors = rng.integers(1, (NSYM - num_of_erasures) // 2 + 3)
+        positions = rng.choice(LENGTH, num_of_erasures + num_of_errors, replace=False)
+        row[positions] ^= rng.integers(1, 256, len(positions), dtype=np.uint8)
+        erased[positions[:num_of_erasures]] = True
+
+    start_time = time.time()
+    decoded, success, errata = rs_decode_batch(received, NSYM, erasures)
+    batch_time = time.time() - start_time
+
+    # reedsolo is the reference, each row is decoded on its own
+    rsc = RSCodec(NSYM, nsize=LENGTH)
+    same = 0
+    start_time = time.time()
+    for i in range(NUM_OF_ROWS):
+        try:
+            _, reference, reference_errata = rsc.decode(bytearray(received[i]),
+                                                        erase_pos=np.flatnonzero(erasures[i]).tolist())
+        except ReedSolomonError:
+            same += not success[i]
+            continue
+        # reedsolo accepts some corrections of erasures beyond the bound, they are not compared
+        errors = len(reference_errata) - erasures[i].sum()
+        if 2 * errors + erasures[i].sum() > NSYM:
+            same += 1
+            continue
+        same += bool(success[i] and bytes(decoded[i]) == bytes(reference) and errata[i] == reference_errata)
+    reference_time = time.time() - start_time
+
+    print(f"rs_decode_batch: {batch_time:.3f}s, reedsolo: {reference_time:.3f}s")
+    print(f"corrected {success.sum()} of {NUM_OF_ROWS}, same as reedsolo: {same} of {NUM_OF_ROWS}, "
+          f"all correct: {bool((decoded[success] == codewords[success]).all())}")
+
+
+if __name__ == '__main__':
+    main()
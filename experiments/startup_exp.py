@@ -0,0 +1,38 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+REPEAT = 5
+MESSAGE_LENGTH = 80000
+# runs in a new interpreter: the time to import the package, and the time to the first encoding with cached graphs
+CHILD = f"""
+import json, time
+start_time = time.perf_counter()
+from LT_code import LTCode
+import_time = time.perf_counter() - start_time
+LTCode(0.2, 0.7, {MESSAGE_LENGTH}).encode(bytes({MESSAGE_LENGTH}))
+print(json.dumps({{'import': import_time, 'first_encode': time.perf_counter() - start_time,
+                   'galois': 'galois' in __import__('sys').modules}}))
+"""
+
+
+def run_child():
+    start_time = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output)
+    result['process'] = time.perf_counter() - start_time
+    return result
+
+
+def main():
+    run_child()  # build the graphs into the cache, so the next runs only load them
+    results = [run_child() for _ in range(REPEAT)]
+    for key in ('import', 'first_encode', 'process'):
+        print(f"{key}: median {statistics.median(result[key] for result in results):.3f}s")
+    print(f"galois imported: {any(result['galois'] for result in results)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
-import galois
-from Graph import Graph
+import numpy as np
+from Graph import Graph, index_dtype
 from parameters import check_legendre_symbols
 
 
@@ -87,18 +87,32 @@ def matrix_to_int(a1, a2, a3, a4, q):
     # q^3+q^2-q-1=(q+1)^2(q-1)
 
 
-def generate_cayley_graph(elements, GF, q, p):
+def field_tables(q):
     """
-    this function builds a cayley graph using the group PGL
+    this function computes the tables of the field GF(q) for a prime q, with modular arithmetic
+    :param q: the size of the field, a prime
+    :return: inv - array of the inverse of each element (0 for 0),
+             mult - 2d array of the multiplications
+    """
+    elements = np.arange(q, dtype=np.intp)
+    mult = elements[:, None] * elements[None, :] % q
+    inv = np.zeros(q, dtype=np.intp)
+    inv[1:] = [pow(a, q - 2, q) for a in range(1, q)]  # Fermat's little theorem
+    return inv, mult
+
+
+def generate_cayley_graph_loop(elements, q, p):
+    """
+    this function builds a cayley graph using the group PGL, one matrix at a time
+    (the reference for 'generate_cayley_graph', which builds the same graph with array operations)
     :param elements: the list of elements we generated in the 'generate_elements' function with input p
-    :param GF: Galois field of size q
     :param q: the amount of nodes is q(q-1)(q+1), and the matrices are of the field GF(q)
     :param p: the degree of the graph minus 1
     :return: the graph we built
     """
     G = Graph(q * (q * q - 1), p + 1)
-    inv = [0] + [int(GF(1)/GF(a)) for a in range(1, q)]
-    mult = [[int(GF(i)*GF(j)) for j in range(q)] for i in range(q)]
+    inv, mult = field_tables(q)
+    inv, mult = inv.tolist(), mult.tolist()
     real_indices = [0] * ((q+1)*(q+1)*(q-1) + 1)
     for i, matrix in enumerate(PGL(q, mult)):
         real_indices[matrix_to_int(*matrix, q)] = i
@@ -122,6 +136,92 @@ def generate_cayley_graph(elements, GF, q, p):
     return G
 
 
+def PGL_array(q, mult):
+    """
+    this function computes all the representatives of the elements of the group PGL, in the order of 'PGL'
+    :param q: the size of the field
+    :param mult: 2d array containing all the multiplications
+    :return: array of shape (q(q-1)(q+1), 4), a representative in each row
+    """
+    y2, y3, j = np.meshgrid(np.arange(q), np.arange(1, q), np.arange(q - 1), indexing='ij')
+    # for each y2, y3 the representatives (0, 1, y3, y2) and then (1, y2, y3, y4) for each y4 != y2*y3
+    block = np.empty((q, q - 1, q, 4), dtype=np.intp)
+    block[:, :, 0] = 0, 1, 0, 0
+    block[:, :, 0, 2] = y3[:, :, 0]
+    block[:, :, 0, 3] = y2[:, :, 0]
+    block[:, :, 1:, 0] = 1
+    block[:, :, 1:, 1] = y2
+    block[:, :, 1:, 2] = y3
+    block[:, :, 1:, 3] = j + (j >= mult[y2, y3])  # skip y4 = y2*y3
+    # for each y2 the representatives (1, y2, 0, y4) for each y4 != 0
+    tail = np.empty((q, q - 1, 4), dtype=np.intp)
+    tail[:, :, 0] = 1
+    tail[:, :, 1] = np.arange(q)[:, None]
+    tail[:, :, 2] = 0
+    tail[:, :, 3] = np.arange(1, q)
+    return np.concatenate((block.reshape(q, -1, 4), tail), axis=1).reshape(-1, 4)
+
+
+def matrices_to_int(matrices, q):
+    """
+    this function computes the mapping 'matrix_to_int' for an array of matrices
+    :param matrices: array of shape (..., 4)
+    :param q: the size of the elements' field
+    :return: the representations of the matrices as integers
+    """
+    a1, a2, a3, a4 = np.moveaxis(matrices, -1, 0)
+    return np.where(a1 == 0, a4 * (q - 1) + (a3 - 1), a2 * q * q + a3 * q + a4 + (q * q - q))
+
+
+def generate_cayley_graph(elements, q, p):
+    """
+    this function builds a cayley graph using the group PGL,
+    all the representatives are multiplied by the generators at once with array operations
+    :param elements: the list of elements we generated in the 'generate_elements' function with input p
+    :param q: the amount of nodes is q(q-1)(q+1), and the matrices are of the field GF(q)
+    :param p: the degree of the graph minus 1
+    :return: the graph we built
+    """
+    inv, mult = field_tables(q)
+    pgl = PGL_array(q, mult)
+    real_indices = np.zeros((q+1)*(q+1)*(q-1) + 1, dtype=np.intp)
+    real_indices[matrices_to_int(pgl, q)] = np.arange(len(pgl))
+    quad_res = np.zeros(q, dtype=bool)
+    quad_res[mult[np.arange(1, q), np.arange(1, q)]] = True
+
+    # the right side - the representatives with a determinant which isn't a quadratic residue
+    det = (mult[pgl[:, 3], pgl[:, 0]] - mult[pgl[:, 1], pgl[:, 2]]) % q
+    y_int = np.flatnonzero(~quad_res[det])
+    y = pgl[y_int, None, :]
+    s = np.array(elements, dtype=np.intp)[None, :, :]
+
+    # x = s*y for all the pairs, shape (len(y_int), len(elements))
+    x0 = (s[..., 0] * y[..., 0] + s[..., 1] * y[..., 2]) % q
+    x1 = (s[..., 0] * y[..., 1] + s[..., 1] * y[..., 3]) % q
+    x2 = (s[..., 2] * y[..., 0] + s[..., 3] * y[..., 2]) % q
+    x3 = (s[..., 2] * y[..., 1] + s[..., 3] * y[..., 3]) % q
+    # normalize to the representative, the first non-zero element of the first row is 1
+    first_inv = inv[np.where(x0 == 0, x1, x0)]
+    x = np.stack((x0 != 0, np.where(x0 == 0, 1, x1 * first_inv % q), x2 * first_inv % q, x3 * first_inv % q),
+                 axis=-1)
+    x_int = real_indices[matrices_to_int(x, q)]
+
+    # the neighbors of the right side are in the order of the generators,
+    # the neighbors of the left side are in the order the edges were found - by y and then by the generator
+    flat_x = x_int.ravel()
+    if np.any(np.bincount(flat_x, minlength=len(pgl))[flat_x] != p + 1):
+        raise ValueError("Failed to create the Ramanujan graph")
+    order = np.argsort(flat_x, kind='stable')  # by x, and by the order the edges were found
+    neighbors = np.zeros((len(pgl), p + 1), dtype=index_dtype(len(pgl)))
+    neighbors[y_int] = x_int
+    A = flat_x[order[::p + 1]]
+    neighbors[A] = np.repeat(y_int, len(elements))[order].reshape(-1, p + 1)
+    is_left = np.zeros(len(pgl), dtype=bool)
+    is_left[A] = True
+    B = np.flatnonzero(~is_left)
+    return Graph.from_arrays(neighbors, A, B)
+
+
 def find_i(q):
     """
     this function finds an element 'i' in the field GF(q) such that i^2=-1
@@ -153,10 +253,9 @@ def ramanujan(p, q):
     """
     if not check_legendre_symbols(p, q):
         raise "Error: The legendre symbol isn't -1"
-    GF = galois.GF(q)
     i = find_i(q)
     matrices = find_S(i, p, q)
-    G = generate_cayley_graph(matrices, GF, q, p)
+    G = generate_cayley_graph(matrices, q, p)
     G.split_to_sides()
     is_right_size(G)
     return G
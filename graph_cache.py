@@ -0,0 +1,171 @@
+import hashlib
+import os
+import struct
+import tempfile
+import numpy as np
+from Graph import Graph, index_dtype
+
+FORMAT_VERSION = 1
+MAGIC = b'LTCG'
+# magic, format version, itemsize of the arrays, p, q, number of nodes, degree, sha256 of the body
+HEADER = struct.Struct('<4sHHIIII32s')
+HEADER_SIZE = 64  # the body starts aligned after the header
+CACHE_DIR = os.environ.get('LTCODE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ltcode'))
+MAX_CACHE_BYTES = int(os.environ.get('LTCODE_GRAPH_CACHE_BYTES', 2 ** 31))  # 2GB
+_verified = set()  # the files whose sha256 was checked (or that were written) in this process, by path and inode
+
+
+def file_key(path):
+    """
+    this function identifies a version of a file, a file that is replaced gets a new inode
+    :param path: the path of the file
+    :return: the path, the inode and the size of the file
+    """
+    stat = os.stat(path)
+    return path, stat.st_ino, stat.st_size
+
+
+def discard(path):
+    """
+    this function removes a file from the cache, the cache can be read only or another process can remove it first
+    :param path: the path of the file
+    :return: None
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def graph_path(p, q, cache_dir=None):
+    """
+    this function computes the path of the cached graph, the name is addressed by the key (p, q, format version)
+    :param p: it tells the degree of the graph p+1
+    :param q: it tells the number of nodes in the graph q(q+1)(q-1)
+    :param cache_dir: the directory of the cache, the default directory if None
+    :return: the path of the file
+    """
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    key = hashlib.sha256(f'ramanujan:{p}:{q}:v{FORMAT_VERSION}'.encode()).hexdigest()
+    return os.path.join(cache_dir, 'graphs', key[:32] + '.ltg')
+
+
+def save_graph(graph, p, q, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """
+    this function writes the neighbors and the sides of the graph to the cache, in the narrowest integer type
+    :param graph: the graph to save
+    :param p: it tells the degree of the graph p+1
+    :param q: it tells the number of nodes in the graph q(q+1)(q-1)
+    :param cache_dir: the directory of the cache, the default directory if None
+    :param max_bytes: the maximal size of the cache, old graphs are evicted above it (but not the new graph)
+    :return: the path of the file
+    """
+    path = graph_path(p, q, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    dtype = index_dtype(graph.num_of_nodes)
+    body = b''.join(np.ascontiguousarray(array, dtype=dtype).tobytes()
+                    for array in (graph.neighbors, graph.A, graph.B))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, dtype.itemsize, p, q, graph.num_of_nodes, graph.degree,
+                         hashlib.sha256(body).digest())
+    # write to a temporary file and rename it, so a reader never sees a partial graph
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(header.ljust(HEADER_SIZE, b'\0'))
+            file.write(body)
+        os.replace(temp_path, path)
+    except OSError:
+        discard(temp_path)
+        raise
+    _verified.add(file_key(path))  # the body was just hashed
+    evict(cache_dir, max_bytes, keep=path)
+    return path
+
+
+def load_graph(p, q, cache_dir=None, verify=True):
+    """
+    this function maps a cached graph into memory
+    :param p: it tells the degree of the graph p+1
+    :param q: it tells the number of nodes in the graph q(q+1)(q-1)
+    :param cache_dir: the directory of the cache, the default directory if None
+    :param verify: whether to check the sha256 of the body, it is checked only on the first load of the file
+                   in the process (the header and the size are checked on every load)
+    :return: the graph, or None if it isn't in the cache or the file is corrupted
+    """
+    path = graph_path(p, q, cache_dir)
+    try:
+        with open(path, 'rb') as file:
+            magic, version, itemsize, p_file, q_file, num_of_nodes, degree, digest = \
+                HEADER.unpack(file.read(HEADER_SIZE)[:HEADER.size])
+        key = file_key(path)
+    except (OSError, struct.error):
+        return None
+    dtype = np.dtype(f'<u{itemsize}')
+    body_size = (num_of_nodes * degree + num_of_nodes) * itemsize  # neighbors, then A and B
+    if magic != MAGIC or version != FORMAT_VERSION or (p_file, q_file) != (p, q) or \
+            key[2] != HEADER_SIZE + body_size:
+        discard(path)  # a corrupted or stale file
+        return None
+    body = np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(body_size // itemsize,))
+    if verify and key not in _verified:
+        if hashlib.sha256(body).digest() != digest:
+            del body
+            discard(path)
+            return None
+        _verified.add(key)
+    try:
+        os.utime(path)  # mark as recently used for the eviction
+    except OSError:
+        pass  # a read only cache is not evicted by us
+    nodes_on_each_side = num_of_nodes // 2
+    neighbors = body[:num_of_nodes * degree].reshape(num_of_nodes, degree)
+    A = body[num_of_nodes * degree:num_of_nodes * degree + nodes_on_each_side]
+    B = body[num_of_nodes * degree + nodes_on_each_side:]
+    return Graph.from_arrays(neighbors, A, B)
+
+
+def evict(cache_dir=None, max_bytes=MAX_CACHE_BYTES, keep=None):
+    """
+    this function removes the least recently used graphs until the cache is smaller than max_bytes
+    :param cache_dir: the directory of the cache, the default directory if None
+    :param max_bytes: the maximal size of the cache
+    :param keep: optional path of a graph that is not removed, even if it alone is larger than max_bytes
+    :return: None
+    """
+    directory = os.path.dirname(graph_path(0, 0, cache_dir))
+    files = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.ltg'):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # another process removed it
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):  # the oldest first
+        if total <= max_bytes:
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        discard(path)
+        total -= size
+
+
+def cached_ramanujan(p, q, cache_dir=None):
+    """
+    this function loads the ramanujan graph from the cache, and builds and stores it if it isn't there
+    :param p: it tells the degree of the graph p+1
+    :param q: it tells the number of nodes in the graph q(q+1)(q-1)
+    :param cache_dir: the directory of the cache, the default directory if None
+    :return: a ramanujan graph
+    """
+    graph = load_graph(p, q, cache_dir)
+    if graph is None:
+        from explicit_ramanujan_construction import ramanujan  # the construction is only needed without the cache
+        graph = ramanujan(p, q)
+        try:
+            save_graph(graph, p, q, cache_dir)
+        except OSError:
+            pass  # the cache isn't writable, we still have the graph
+    return graph
@@ -1,121 +1,362 @@
+import functools
+import numpy as np
 import reedsolo
-from reedsolo import RSCodec
-from LinkedList import LinkedList
+from decode_stats import stage
+from rs_batch import MATRIX_CACHE_SIZE, gf_matmul, rs_decode, rs_decode_batch, rs_encode_batch, \
+    rs_erasure_decode_batch, symbol_dtype
 
 
-def encode_ramanujan(graph, word, gamma_tag):
+@functools.lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def vertex_generator_matrix(d, rsc1_redundancy, rsc2_redundancy, c_exp=8):
+    """
+    This function computes the linear map from the d symbols of a vertex to its redundancy,
+    the rsc1 redundancy encoded with rsc2
+    :param d: the degree of the graph
+    :param rsc1_redundancy: the number of ecc symbols of rsc1
+    :param rsc2_redundancy: the number of ecc symbols of rsc2
+    :param c_exp: the exponent of the field of the symbols
+    :return: matrix of shape (d, rsc1_redundancy + rsc2_redundancy), row j is the redundancy of the j-th unit vector
+    """
+    rsc1_parity = rs_encode_batch(np.eye(d, dtype=symbol_dtype(c_exp)), rsc1_redundancy, c_exp)[:, d:]
+    generator_matrix = rs_encode_batch(rsc1_parity, rsc2_redundancy, c_exp)
+    generator_matrix.setflags(write=False)
+    return generator_matrix
+
+
+def encode_ramanujan(graph, word, gamma_tag, c_exp=8):
     """
     This function encodes each of the vertices with systematic MDS,
     and then encodes the redundancy with rate 1/4 Reed Solomon
     :param graph: Ramanujan graph
-    :param word: word to encode - must be the same length as the num of edges
+    :param word: word to encode - must be the same length as the num of edges,
+                 or a matrix with one word in each row to encode many words at once
     :param gamma_tag: the rate of the first Reed Solomon??
+    :param c_exp: Optional exponent of the field of the symbols, 16 for the symbols of two bytes
     :return: a systematic codeword - the original word concatenated to all the redundancies
     """
     # graph stuff
     m = graph.num_of_edges
     d = graph.degree
-    edges = graph.edges()  # the edges [[x,y]...[z,w]]
-
-    # encoding stuff
-    vertices = [bytearray(d) for _ in range(graph.num_of_nodes)]  # each node holds a word to encode
-    symbol_counter = [0] * graph.num_of_nodes
-
-    # putting the symbols of the word in the vertices
-    for (node1, node2), symbol in zip(edges, word):
-        vertex_index = symbol_counter[node1]
-        vertices[node1][vertex_index] = symbol  # append the symbol on the edge to the list of x
-        vertex_index = symbol_counter[node2]
-        vertices[node2][vertex_index] = symbol  # append the symbol on the edge to the list of y
-        symbol_counter[node1] += 1
-        symbol_counter[node2] += 1
-
-    # the reed solomons
+    dtype = symbol_dtype(c_exp)
+
+    # putting the symbols of the word in the vertices, each node holds a word to encode
+    if isinstance(word, np.ndarray):
+        word = word.astype(dtype, copy=False)
+    else:
+        word = np.frombuffer(bytes(word), dtype=dtype)
+    vertices = word[..., graph.incidence()]
+
+    # the reed solomons, applied to all the vertices at once as one linear map
     nodeword_length = round(4*d*gamma_tag)  # the length of the codeword on each node
     rsc1_redundancy = round(gamma_tag*d + 0.5)
     rsc2_redundancy = int(nodeword_length - rsc1_redundancy)
-    rsc1 = RSCodec(rsc1_redundancy, nsize=255)
-    rsc2 = RSCodec(rsc2_redundancy, nsize=255)
-    word = bytearray(word) + bytearray(8 * int(m*gamma_tag))  # allocation
-    for i, v in enumerate(vertices):  # encode each node twice
-        word[m+nodeword_length*i:m+nodeword_length*(i+1)] = rsc2.encode(rsc1.encode(v)[d:])
-    return word
+    redundancies = gf_matmul(vertices, vertex_generator_matrix(d, rsc1_redundancy, rsc2_redundancy, c_exp), c_exp)
+
+    # allocation, the original word concatenated to the redundancies of the nodes
+    lead = word.shape[:-1]
+    redundancies = redundancies.reshape(lead + (-1,))
+    length = max(word.shape[-1] + 8 * int(m*gamma_tag), m + redundancies.shape[-1])
+    codeword = np.zeros(lead + (length,), dtype=dtype)
+    codeword[..., :word.shape[-1]] = word
+    codeword[..., m:m + redundancies.shape[-1]] = redundancies
+    return codeword
+
+
+def decode_vertices(incidence, words, check_symbols, rows, nsym, c_exp=8):
+    """
+    This function decodes vertices that don't share edges together with rsc1:
+    their symbols are gathered from the words, decoded at once, and the corrections are written back to the words
+    :param incidence: the edges of each vertex
+    :param words: matrix with one word in each row, it is changed in place
+    :param check_symbols: array of shape (words, vertices, nsym), the decoded rsc1 redundancy of each vertex of each
+                          word, the cut check symbols at the end of the word can be shorter than nsym, and then only
+                          the first symbols of the vertex are corrected
+    :param rows: the vertices to decode, the row of vertex v of word i is i * len(incidence) + v
+    :param nsym: the number of ecc symbols of rsc1
+    :param c_exp: the exponent of the field of the symbols
+    :return: the rows that were decoded
+    """
+    d = incidence.shape[1]
+    messages, vertices = np.divmod(rows, len(incidence))
+    edges = incidence[vertices]
+    received = np.concatenate((words[messages[:, None], edges], check_symbols[messages, vertices]), axis=1)
+    vertex_words, ok, _ = rs_decode_batch(received, nsym, c_exp=c_exp)
+    ok &= ~(vertex_words[:, d:] != received[:, d:]).any(axis=1)  # check if the redundancy is correct
+    message_length = min(d, max(vertex_words.shape[1] - nsym, 0))
+    words[messages[ok, None], edges[ok, :message_length]] = vertex_words[ok, :message_length]
+    return rows[ok]
+
+
+def split_redundancies(codewords, redundancy):
+    """
+    This function stacks the redundancies of the vertices of many codewords, the redundancies at the end of the word
+    can be cut, and they are grouped by their length (the lengths are the same in all the codewords)
+    :param codewords: list of codewords - each is the word and a list of redundancies
+    :param redundancy: the length of a full redundancy
+    :return: num_full - the number of vertices with full redundancies, the first vertices
+             full - array of shape (codewords, num_full, redundancy)
+             cut_groups - list of the vertices of each length, and their redundancies of shape (codewords, vertices,
+                          length)
+    """
+    redundancies = codewords[0][1]
+    num_full = 0
+    while num_full < len(redundancies) and len(redundancies[num_full]) == redundancy:
+        num_full += 1
+    full = np.asarray([codeword[1][:num_full] for codeword in codewords]).reshape(len(codewords), num_full,
+                                                                                   redundancy)
+    cut = np.arange(num_full, len(redundancies))
+    cut_lengths = np.array([len(cs) for cs in redundancies[num_full:]], dtype=np.intp)
+    cut_groups = []
+    for length in np.unique(cut_lengths).tolist():
+        nodes = cut[cut_lengths == length]
+        group = np.asarray([[codeword[1][x] for x in nodes] for codeword in codewords])
+        cut_groups.append((nodes, group.reshape(len(codewords), len(nodes), length)))
+    return num_full, full, cut_groups
 
 
-def decode_ramanujan(graph, codeword, gamma_tag):
+def decode_ramanujan(graph, codeword, gamma_tag, stats=None, workers=1, c_exp=8):
     """
     This function decodes the redundancies of codeword with rate 1/4 Reed Solomon
-    and then decodes each of the vertices with systematic MDS.
+    and then decodes each of the vertices with systematic MDS, see decode_ramanujan_many
     :param graph: Ramanujan graph
     :param codeword: word to decode - a list of size 2 - the word and a list of redundancies
     :param gamma_tag: the rate of the first Reed Solomon??
+    :param stats: Optional DecodeStats to fill with the times and the counters of the check symbols and the vertices
+    :param workers: Optional number of processes, the vertices of each round are split between them,
+                    None for the number of cpus
+    :param c_exp: Optional exponent of the field of the symbols, 16 for the symbols of two bytes
     :return: the decoded word
     """
+    return decode_ramanujan_many(graph, [codeword], gamma_tag, stats, workers, c_exp)[0]
+
+
+def decode_ramanujan_many(graph, codewords, gamma_tag, stats=None, workers=1, c_exp=8):
+    """
+    This function decodes the redundancies of many codewords with rate 1/4 Reed Solomon
+    and then decodes each of the vertices with systematic MDS.
+    The vertices are decoded in rounds, first side A, then side B, and then the neighbors of the vertices decoded in
+    the last round. The vertices of a round are on the same side, so they don't share edges and are decoded together,
+    the vertices of all the codewords in one batch
+    :param graph: Ramanujan graph
+    :param codewords: list of words to decode - each is a list of size 2 - the word and a list of redundancies
+    :param gamma_tag: the rate of the first Reed Solomon??
+    :param stats: Optional DecodeStats to fill with the times and the counters of the check symbols and the vertices
+    :param workers: Optional number of processes, the vertices of each round are split between them,
+                    None for the number of cpus
+    :param c_exp: Optional exponent of the field of the symbols, 16 for the symbols of two bytes
+    :return: list of the decoded words, each with a flag if we think it was decoded successfully
+    """
     # graph stuff
     num_of_nodes = graph.num_of_nodes
     d = graph.degree
 
     # extract from the encoding
-    word = bytearray(codeword[0])  # the original word
-    check_symbols = codeword[1]  # the encoded redundancy for each node
+    dtype = symbol_dtype(c_exp)
+    num_of_words = len(codewords)
+    words = np.array([codeword[0] for codeword in codewords], dtype=dtype)  # the original words
+    received = words.copy()
 
     # setting up the reed solomon
     redundancy = round(4 * d * gamma_tag)
     rsc1_redundancy = round(gamma_tag*d + 0.5)
     rsc2_redundancy = int(redundancy - rsc1_redundancy)
-    rsc1 = RSCodec(rsc1_redundancy, nsize=255)
-    rsc2 = RSCodec(rsc2_redundancy, nsize=255)
-
-    finished = [False] * num_of_nodes  # for each node we need to know if it finished
-    success_flag = True  # we return a flag that indicates if we think we decoded successfully
-    # decode each of the check symbols
-    for i_cs, cs in enumerate(check_symbols):
-        to_dec = cs
-        try:
-            check_symbols[i_cs] = list(rsc2.decode(to_dec)[0])
-        except reedsolo.ReedSolomonError:
-            success_flag = False  # we failed a decoding, so we think we failed
-            finished[i_cs] = True  # the check symbols are wrong, and we don't want to continue decoding with it
-
-    left_to_decode = LinkedList(graph.A)  # the linked list we run over in the main loop
-
-    edges = list(graph.edges())  # the edges of the graph
-    Ev = [[-1] * d for _ in range(num_of_nodes)]  # edges connected to v
-    symbol_counters = [0] * num_of_nodes
-    for i, (node1, node2) in enumerate(edges):
-        vertex_index = symbol_counters[node1]
-        Ev[node1][vertex_index] = i  # append the index to the first node list
-        vertex_index = symbol_counters[node2]
-        Ev[node2][vertex_index] = i  # append the index to the second node list
-        symbol_counters[node1] += 1  # increment the first counter
-        symbol_counters[node2] += 1  # increment the second counter
-
-    is_in_linked_list = [False] * num_of_nodes  # list to make sure there are no duplicates in the linked list
+
+    # decode all the check symbols at once,
+    # except for the last ones which can be cut at the end of the word and are decoded in groups of the same length
+    with stage(stats, 'check_symbols'):
+        num_full, full, cut_groups = split_redundancies(codewords, redundancy)
+        full = full.astype(dtype, copy=False).reshape(-1, redundancy)
+        check_symbols, decoded, _ = rs_decode_batch(full, rsc2_redundancy, c_exp=c_exp)
+        if stats is not None:
+            stats.check_symbols += num_of_words * len(codewords[0][1])
+            stats.check_symbols_failed += int(np.count_nonzero(~decoded))
+            stats.check_symbols_corrected += int(np.count_nonzero(check_symbols[decoded] != full[decoded]))
+        # the redundancy of rsc1 on each node
+        check_symbols = check_symbols[:, :rsc1_redundancy].reshape(num_of_words, num_full, rsc1_redundancy)
+        # if the check symbols are wrong, we don't want to continue decoding with them
+        finished = np.zeros((num_of_words, num_of_nodes), dtype=bool)  # for each node we need to know if it finished
+        finished[:, :num_full] = ~decoded.reshape(num_of_words, num_full)
+        success_flags = decoded.reshape(num_of_words, num_full).all(axis=1)  # if we think we decoded successfully
+        short_groups = []  # the nodes with cut check symbols and their decoded check symbols, by the length
+        for nodes, group in cut_groups:
+            length = group.shape[-1]
+            group = group.astype(dtype, copy=False).reshape(num_of_words * len(nodes), length)
+            group, decoded, _ = rs_decode_batch(group, rsc2_redundancy, c_exp=c_exp)
+            decoded = decoded.reshape(num_of_words, len(nodes))
+            finished[:, nodes] |= ~decoded
+            success_flags &= decoded.all(axis=1)  # we failed a decoding, so we think we failed
+            if stats is not None:
+                stats.check_symbols_failed += int(np.count_nonzero(~decoded))
+            short_check_symbols = group[:, :max(length - rsc2_redundancy, 0)]
+            short_groups.append((nodes, short_check_symbols.reshape(num_of_words, len(nodes), -1)))
+
+    Ev = graph.incidence()  # edges connected to v
+    full_Ev = Ev[:num_full]  # the nodes with full check symbols are the first ones
+    pool = None
+    if workers is None or workers > 1:
+        from parallel import VertexPool  # the processes are only needed for a parallel decoding
+        pool = VertexPool(full_Ev, words, check_symbols, rsc1_redundancy, workers, c_exp)
+        words = pool.words  # the words are shared with the processes
+    frontier = np.zeros((num_of_words, num_of_nodes), dtype=bool)  # the nodes of the current round
+    frontier[:, graph.A] = True
     first_time = True  # if it is first time, we want to run over all B side and not just the neighbors
-    while left_to_decode.head:  # while there are still nodes in the linked list
-        temp_linked_list = LinkedList()
-        for x in left_to_decode.run_over():  # run over the nodes in the current linked list
-            is_in_linked_list[x] = False  # reset it for the next iteration to be able to append us
-            if finished[x]:  # if we already decoded the node continue to the next one
-                continue
-            word_v = [word[j2] for j2 in Ev[x]]  # symbols on the edges of v
-            redundancy_v = check_symbols[x]  # the redundancy of v
-            try:
-                rmes, rmesecc, errata_pos = rsc1.decode(word_v + redundancy_v)
-            except reedsolo.ReedSolomonError:
-                continue
-            if errata_pos and errata_pos[0] >= d:  # check if the redundancy is correct
-                continue
-            # copying the decoded symbols
-            for i, symbol in zip(Ev[x], rmes):
-                word[i] = symbol
-            finished[x] = True  # set the node as decoded
-            # create a linked list of only the neighbors that aren't already in it
-            to_append = [j for j in graph.neighbors[x] if not is_in_linked_list[j]]
-            temp_linked_list.insert_list(to_append)
-        if not first_time:
-            left_to_decode = temp_linked_list
-        else:
-            left_to_decode = LinkedList(graph.B)  # linked list of B side
-        first_time = False
-    return word, (min(finished) and success_flag)  # the word and a flag if we think we finished
+    queue_sizes = []  # the number of nodes in each round
+    attempts = successes = 0  # the number of decodings of nodes
+    try:
+        with stage(stats, 'vertices'):
+            while frontier.any():
+                queue_sizes.append(int(np.count_nonzero(frontier)))
+                pending = frontier & ~finished  # if we already decoded the node we skip it
+                attempts += int(np.count_nonzero(pending))
+
+                # all the nodes with full check symbols of all the words at once
+                full_pending = np.flatnonzero(pending[:, :num_full])
+                if pool is None:
+                    decoded_rows = decode_vertices(full_Ev, words, check_symbols, full_pending, rsc1_redundancy, c_exp)
+                else:
+                    decoded_rows = pool.decode(full_pending)
+                decoded_words, decoded_nodes = np.divmod(decoded_rows, num_full)
+                decoded_words, decoded_nodes = [decoded_words], [decoded_nodes]
+
+                # the nodes with cut check symbols, each group together
+                for nodes, short_check_symbols in short_groups:
+                    group_pending = np.flatnonzero(pending[:, nodes])
+                    decoded_group = decode_vertices(Ev[nodes], words, short_check_symbols, group_pending,
+                                                    rsc1_redundancy, c_exp)
+                    group_words, group_nodes = np.divmod(decoded_group, len(nodes))
+                    decoded_words.append(group_words)
+                    decoded_nodes.append(nodes[group_nodes])
+
+                decoded_words = np.concatenate(decoded_words).astype(np.intp)
+                decoded_nodes = np.concatenate(decoded_nodes).astype(np.intp)
+                finished[decoded_words, decoded_nodes] = True  # set the nodes as decoded
+                successes += len(decoded_nodes)
+                frontier = np.zeros((num_of_words, num_of_nodes), dtype=bool)
+                if not first_time:
+                    # the neighbors of the decoded nodes
+                    frontier[decoded_words[:, None], graph.neighbors[decoded_nodes]] = True
+                else:
+                    frontier[:, graph.B] = True  # B side
+                first_time = False
+    finally:
+        if pool is not None:
+            words = np.array(words)  # a copy out of the shared memory, which is released
+            pool.close()
+    if stats is not None:
+        stats.vertex_attempts += attempts
+        stats.vertex_successes += successes
+        stats.rounds += len(queue_sizes)
+        stats.queue_sizes.extend(queue_sizes)
+        stats.vertex_symbols_corrected += int(np.count_nonzero(words != received))
+    # the words and flags if we think we finished
+    return [(bytearray(word), bool(done and flag))
+            for word, done, flag in zip(words, finished.all(axis=1).tolist(), success_flags.tolist())]
+
+
+def decode_vertex(d, word_v, redundancy_v, gamma_tag, word_erasures=(), redundancy_erasures=(), c_exp=8):
+    """
+    This function decodes a single vertex, as decode_ramanujan does: first its check symbols with rsc2,
+    and then its symbols with rsc1
+    :param d: the degree of the graph
+    :param word_v: the symbols on the edges of the vertex
+    :param redundancy_v: the encoded redundancy of the vertex
+    :param gamma_tag: the rate of the first Reed Solomon??
+    :param word_erasures: Optional positions of the erased symbols of the vertex
+    :param redundancy_erasures: Optional positions of the erased symbols of the redundancy
+    :param c_exp: Optional exponent of the field of the symbols, 16 for the symbols of two bytes
+    :return: the decoded symbols of the vertex, None if the decoding failed
+    """
+    redundancy = round(4 * d * gamma_tag)
+    rsc1_redundancy = round(gamma_tag*d + 0.5)
+    rsc2_redundancy = int(redundancy - rsc1_redundancy)
+    try:
+        check_symbols = rs_decode(list(redundancy_v), rsc2_redundancy, list(redundancy_erasures), c_exp)[0]
+        rmes, rmesecc, errata_pos = rs_decode(list(word_v) + list(check_symbols), rsc1_redundancy,
+                                              list(word_erasures), c_exp)
+    except reedsolo.ReedSolomonError:
+        return None
+    if errata_pos and errata_pos[0] >= d:  # the redundancy is wrong
+        return None
+    return rmes
+
+
+def decode_ramanujan_erasures(graph, codeword, gamma_tag, erasures, stats=None, c_exp=8):
+    """
+    This function decodes a codeword that has only erasures, without errors, see decode_ramanujan_erasures_many
+    :param graph: Ramanujan graph
+    :param codeword: word to decode - a list of size 2 - the word and a list of redundancies
+    :param gamma_tag: the rate of the first Reed Solomon??
+    :param erasures: boolean masks of the erased symbols, in the same structure as the codeword
+    :param stats: Optional DecodeStats to fill with the times and the counters of the check symbols and the vertices
+    :param c_exp: Optional exponent of the field of the symbols, 16 for the symbols of two bytes
+    :return: the decoded word, and a flag if all the erasures were filled
+    """
+    return decode_ramanujan_erasures_many(graph, [codeword], gamma_tag, [erasures], stats, c_exp)[0]
+
+
+def decode_ramanujan_erasures_many(graph, codewords, gamma_tag, erasures, stats=None, c_exp=8):
+    """
+    This function decodes many codewords that have only erasures, without errors.
+    The erasures of the check symbols are filled first, and then the vertices are peeled:
+    each round fills all the vertices with few enough erasures, which can let their neighbors be filled next round.
+    Vertices without erasures are not decoded, the vertices of all the codewords are filled in one batch
+    :param graph: Ramanujan graph
+    :param codewords: list of words to decode - each is a list of size 2 - the word and a list of redundancies
+    :param gamma_tag: the rate of the first Reed Solomon??
+    :param erasures: list of the boolean masks of the erased symbols of each codeword, in the same structure
+    :param stats: Optional DecodeStats to fill with the times and the counters of the check symbols and the vertices
+    :param c_exp: Optional exponent of the field of the symbols, 16 for the symbols of two bytes
+    :return: list of the decoded words, each with a flag if all its erasures were filled
+    """
+    d = graph.degree
+    redundancy = round(4 * d * gamma_tag)
+    rsc1_redundancy = round(gamma_tag*d + 0.5)
+    rsc2_redundancy = int(redundancy - rsc1_redundancy)
+
+    dtype = symbol_dtype(c_exp)
+    num_of_words = len(codewords)
+    words = np.array([codeword[0] for codeword in codewords], dtype=dtype)
+    erased = np.array([word_erasures[0] for word_erasures in erasures], dtype=bool)
+
+    # fill the check symbols, the last ones can be cut at the end of the word and can't be used
+    with stage(stats, 'check_symbols'):
+        num_full, full, _ = split_redundancies(codewords, redundancy)
+        full = full.astype(dtype, copy=False).reshape(-1, redundancy)
+        full_erasures = split_redundancies(erasures, redundancy)[1].astype(bool, copy=False).reshape(-1, redundancy)
+        num_of_nodes = len(codewords[0][1])
+        check_symbols = np.zeros((num_of_words, num_of_nodes, rsc1_redundancy), dtype=dtype)
+        check_ok = np.zeros((num_of_words, num_of_nodes), dtype=bool)
+        full, full_ok = rs_erasure_decode_batch(full, rsc2_redundancy, full_erasures, c_exp)
+        check_ok[:, :num_full] = full_ok.reshape(num_of_words, num_full)
+        check_symbols[:, :num_full] = full[:, :rsc1_redundancy].reshape(num_of_words, num_full, rsc1_redundancy)
+    if stats is not None:
+        stats.check_symbols += check_ok.size
+        stats.check_symbols_failed += int(np.count_nonzero(~check_ok))
+        stats.check_symbols_corrected += int(np.count_nonzero(full_erasures[full_ok]))
+
+    # peel the vertices
+    Ev = graph.incidence()  # edges connected to each vertex
+    with stage(stats, 'vertices'):
+        while True:
+            counts = erased[:, Ev].sum(axis=2)
+            ready_words, ready = np.nonzero((counts > 0) & (counts <= rsc1_redundancy) & check_ok)
+            if len(ready) == 0:
+                break
+            edges = Ev[ready]
+            vertex_words = np.concatenate((words[ready_words[:, None], edges], check_symbols[ready_words, ready]),
+                                          axis=1)
+            vertex_erasures = np.concatenate((erased[ready_words[:, None], edges],
+                                              np.zeros((len(ready), rsc1_redundancy), dtype=bool)), axis=1)
+            vertex_words, _ = rs_erasure_decode_batch(vertex_words, rsc1_redundancy, vertex_erasures, c_exp)
+            num_of_erased = int(np.count_nonzero(erased))
+            # the vertices of the same round can share an edge, but they fill it with the same symbol
+            words[ready_words[:, None], edges] = vertex_words[:, :d]
+            erased[ready_words[:, None], edges] = False
+            if stats is not None:
+                stats.rounds += 1
+                stats.queue_sizes.append(len(ready))
+                stats.vertex_attempts += len(ready)
+                stats.vertex_successes += len(ready)  # a vertex with few enough erasures is always filled
+                stats.vertex_symbols_corrected += num_of_erased - int(np.count_nonzero(erased))
+    return [(bytearray(word), bool(ok and not word_erased.any()))
+            for word, ok, word_erased in zip(words, check_ok.all(axis=1).tolist(), erased)]
@@ -1,25 +1,41 @@
-import reedsolo
-from reedsolo import RSCodec
-from expander_code import decode_expander, encode_expander
-from left_code import encode_ramanujan, decode_ramanujan
-from explicit_ramanujan_construction import ramanujan
+import numpy as np
+from codeword import Codeword
+from decode_stats import stage
+from expander_code import decode_expander, encode_expander, routing_plan
+from left_code import encode_ramanujan, decode_ramanujan_erasures_many, decode_ramanujan_many, decode_vertex, \
+    vertex_generator_matrix
+from parameters import field_exponent
+from rs_batch import bytes_to_symbols, field, gf_matmul, parity_matrix, rs_calc_syndromes_batch, rs_decode_batch, \
+    rs_encode_batch, rs_erasure_decode_batch, symbol_dtype
+from graph_cache import cached_ramanujan
 from datetime import datetime
 
 
-def init_graphs(pr, qr, pe, qe):
-    ramanujan_graph = ramanujan(pr, qr)
-    expander_graph = ramanujan(pe, qe)
+def init_graphs(pr, qr, pe, qe, cache_dir=None):
+    """
+    Loads the Ramanujan graph and the expander graph from the graph cache, the graphs are built on the first use.
+    :param pr: 'p' parameter for the ramanujan graph
+    :param qr: 'q' parameter for the ramanujan graph
+    :param pe: 'p' parameter for the expander graph
+    :param qe: 'q' parameter for the expander graph
+    :param cache_dir: Optional directory of the graph cache
+    :return: the Ramanujan graph and the expander graph
+    """
+    ramanujan_graph = cached_ramanujan(pr, qr, cache_dir)
+    expander_graph = cached_ramanujan(pe, qe, cache_dir)
     return ramanujan_graph, expander_graph
 
 
-def linear_encode(message_to_encode, pr, qr, pe, qe, b, epsilon, ramanujan_graph=None, expander_graph=None):
+def linear_encode(message_to_encode, pr, qr, pe, qe, b, epsilon, ramanujan_graph=None, expander_graph=None, out=None):
     """
     Encodes a given word in linear time, using a combination of Ramanujan graphs and Reed-Solomon codes.
     Process overview:
         1. Left code: Applies encoding via Ramanujan graph and Reed-Solomon.
         2. Block encoding: Splits the word into blocks and encodes each with a Reed-Solomon code.
         3. Expander code: Rearrange the order of the symbols, to deal bursts of errors efficiently.
-    :param message_to_encode: The message to be encoded
+    When the degrees of the graphs are too large for Reed-Solomon over GF(2^8), the field is GF(2^16) and every two
+    bytes of the message are one symbol (see parameters.field_exponent).
+    :param message_to_encode: The message to be encoded, or a matrix with one message in each row
     :param pr: 'p' parameter for the ramanujan graph
     :param qr: 'q' parameter for the ramanujan graph
     :param pe: 'p' parameter for the expander graph
@@ -28,52 +44,66 @@ def linear_encode(message_to_encode, pr, qr, pe, qe, b, epsilon, ramanujan_graph
     :param b: The size of each block before Reed-Solomon encoding
     :param expander_graph: Optional pre-initialized expander graph
     :param ramanujan_graph: Optional pre-initialized Ramanujan graph.
-    :return: Systematic encoding presented as a list of blocks
+    :param out: Optional array of shape (n, delta) to write the codeword into, such as a mapped codeword file
+    :return: Systematic encoding presented as a Codeword, one block in each row
+             (for a matrix of messages, an array of shape (messages, n, delta))
     """
     # Left code
     if ramanujan_graph is None:
-        ramanujan_graph = ramanujan(pr, qr)  # generate the ramanujan graph
-    partially_encoded_msg = encode_ramanujan(ramanujan_graph, message_to_encode, epsilon / 32)
+        ramanujan_graph = cached_ramanujan(pr, qr)  # generate the ramanujan graph
+    c_exp = field_exponent(pr, pe, epsilon)
+    partially_encoded_msg = encode_ramanujan(ramanujan_graph, bytes_to_symbols(message_to_encode, c_exp), epsilon / 32,
+                                             c_exp)
+    lead = partially_encoded_msg.shape[:-1]  # the messages axis, if there are many messages
 
     # Block encoding: Split word into blocks and apply Reed-Solomon encoding
     if expander_graph is None:
-        expander_graph = ramanujan(pe, qe)  # generate the expander graph
+        expander_graph = cached_ramanujan(pe, qe)  # generate the expander graph
     n = expander_graph.num_of_nodes // 2  # nodes on each side of the expander
     delta = expander_graph.degree
-    rsc3 = RSCodec(int(delta - b), nsize=255)  # Initialize Reed-Solomon code
 
-    # Split the encoded word into blocks of size b
-    blocks = [partially_encoded_msg[b * i:b * (i + 1)] for i in range(n)]
+    # Split the encoded word into n blocks of size b, the blocks after the end of the word are padded with zeros
+    blocks = np.zeros(lead + (n, b), dtype=partially_encoded_msg.dtype)
+    word_length = min(partially_encoded_msg.shape[-1], n * b)
+    blocks.reshape(lead + (-1,))[..., :word_length] = partially_encoded_msg[..., :word_length]
 
-    # Ensure all blocks have the correct length, padding where necessary
-    # idx will be the first block to pad
-    idx = 0
-    for bl in blocks:
-        idx += 1
-        if len(bl) != b:
-            break
+    # Apply Reed-Solomon encoding to all the blocks at once
+    blocks = rs_encode_batch(blocks, int(delta - b), c_exp)
 
-    blocks[idx - 1] += bytearray(b - len(blocks[idx - 1]))
-    empty_block = bytearray(b)
-    for i in range(idx, len(blocks)):
-        blocks[i] = empty_block
+    # Expander code: Apply expander graph encoding to the blocks
+    code = encode_expander(expander_graph, blocks, out)
+    return code.view(Codeword) if code.ndim == 2 else code
 
-    # Apply Reed-Solomon encoding to each block
-    blocks = [rsc3.encode(bl) for bl in blocks]
 
-    # Expander code: Apply expander graph encoding to the blocks
-    code = encode_expander(expander_graph, blocks)
-    return code
+def linear_encode_many(messages, pr, qr, pe, qe, b, epsilon, ramanujan_graph=None, expander_graph=None):
+    """
+    Encodes many messages of the same length at once, every stage of linear_encode runs on all of them together.
+    :param messages: list of messages, or a matrix with one message in each row
+    :param pr: 'p' parameter for the ramanujan graph
+    :param qr: 'q' parameter for the ramanujan graph
+    :param pe: 'p' parameter for the expander graph
+    :param qe: 'q' parameter for the expander graph
+    :param epsilon: Small value related to the distance of the code
+    :param b: The size of each block before Reed-Solomon encoding
+    :param expander_graph: Optional pre-initialized expander graph
+    :param ramanujan_graph: Optional pre-initialized Ramanujan graph.
+    :return: array of shape (messages, n, delta), the codewords in the order of the messages
+    """
+    if not isinstance(messages, np.ndarray):
+        messages = np.array([np.frombuffer(bytes(message), dtype=np.uint8) for message in messages], dtype=np.uint8)
+    return linear_encode(messages.reshape(len(messages), -1), pr, qr, pe, qe, b, epsilon, ramanujan_graph,
+                         expander_graph)
 
 
-def linear_decode(encoded_message, pr, qr, pe, qe, b, epsilon, ramanujan_graph=None, expander_graph=None, erasures=[]):
+def linear_decode(encoded_message, pr, qr, pe, qe, b, epsilon, ramanujan_graph=None, expander_graph=None, erasures=[],
+                  workers=1, only_erasures=False, stats=None):
     """
     Decodes a given encoded word in linear time, using a combination of Ramanujan graphs and Reed-Solomon codes.
     Process overview:
         1. Expander code: Rearranging the codeword using an expander graph.
         2. Block decoding: Applies Reed-Solomon decoding to each block.
         3. Left code: Decodes the concatenated blocks using a Ramanujan graph and Reed-Solomon.
-    :param encoded_message: The encoded message to decode.
+    :param encoded_message: The encoded message to decode, a Codeword or any buffer of the n x delta symbols
     :param pr: 'p' parameter for the ramanujan graph
     :param qr: 'q' parameter for the ramanujan graph
     :param pe: 'p' parameter for the expander graph
@@ -82,51 +112,343 @@ def linear_decode(encoded_message, pr, qr, pe, qe, b, epsilon, ramanujan_graph=N
     :param b: The size of each block before Reed-Solomon encoding
     :param expander_graph: Optional pre-initialized expander graph
     :param ramanujan_graph: Optional pre-initialized Ramanujan graph.
-    :param erasures: Optional position of erasures in the codeword
+    :param erasures: Optional position of erasures in the codeword, or a boolean mask of the erased symbols
+    :param workers: Optional number of processes for the block and the vertex decoding, None for the number of cpus
+    :param only_erasures: Optional, True if the caller knows there are no errors, only the erasures are filled
+    :param stats: Optional DecodeStats to fill with the times and the counters of the stages
     :return: the decoded word
     """
+    # no copy for a contiguous buffer
+    encoded_message = Codeword(encoded_message, pe + 1, symbol_dtype(field_exponent(pr, pe, epsilon)))
+    return linear_decode_many(encoded_message[np.newaxis], pr, qr, pe, qe, b, epsilon, ramanujan_graph,
+                              expander_graph, [erasures], workers, only_erasures, stats)[0]
 
-    # Expander graph decoding
-    if expander_graph is None:
-        expander_graph = ramanujan(pe, qe)
-    partially_decoded_msg, new_erasures = decode_expander(expander_graph, encoded_message, erasures)
 
-    # Block decoding using Reed-Solomon
+def linear_decode_many(encoded_messages, pr, qr, pe, qe, b, epsilon, ramanujan_graph=None, expander_graph=None,
+                       erasures=None, workers=1, only_erasures=False, stats=None):
+    """
+    Decodes many codewords at once, every stage runs on all of them together:
+    the expander code, the block decoding, and the rounds of the vertices of the left code.
+    :param encoded_messages: array of shape (messages, n, delta), or a list of codewords
+    :param pr: 'p' parameter for the ramanujan graph
+    :param qr: 'q' parameter for the ramanujan graph
+    :param pe: 'p' parameter for the expander graph
+    :param qe: 'q' parameter for the expander graph
+    :param epsilon: Small value related to the distance of the code
+    :param b: The size of each block before Reed-Solomon encoding
+    :param expander_graph: Optional pre-initialized expander graph
+    :param ramanujan_graph: Optional pre-initialized Ramanujan graph.
+    :param erasures: Optional list with the position of erasures in each codeword (or a boolean mask)
+    :param workers: Optional number of processes for the block and the vertex decoding, None for the number of cpus
+    :param only_erasures: Optional, True if the caller knows there are no errors, only the erasures are filled
+    :param stats: Optional DecodeStats to fill with the times and the counters of the stages (of all the codewords)
+    :return: list of the decoded words, in the order of the codewords
+    """
+    if expander_graph is None:
+        expander_graph = cached_ramanujan(pe, qe)
+    n = expander_graph.num_of_nodes // 2
     delta = expander_graph.degree
-    rsc3 = RSCodec(int(delta - b), nsize=255)
-    blocks = [-1] * len(partially_decoded_msg)
-
-    # trying to decode each of the blocks
-    for i, block in enumerate(partially_decoded_msg):
-        try:
-            blocks[i] = rsc3.decode(block, erase_pos=new_erasures[i])[0]
-        except reedsolo.ReedSolomonError:
-            blocks[i] = block[:b]  # if it couldn't decode, arbitrary block
-            for ep in new_erasures[i]:
-                block[ep] = 0
-
-    # concatenate the blocks
-    num_of_blocks = len(blocks)
-    word = [-1] * (b * num_of_blocks)
-    i = 0
-    for block in blocks:
-        word[i:i + b] = block
-        i += b
-
-    # re-split the blocks
+    c_exp = field_exponent(pr, pe, epsilon)
+    encoded_messages = np.asarray(encoded_messages, dtype=symbol_dtype(c_exp)).reshape(-1, n, delta)
+    num_of_messages = len(encoded_messages)
+    erasures_mask = np.zeros((num_of_messages, n), dtype=bool)
+    for i, message_erasures in enumerate(erasures if erasures is not None else []):
+        message_erasures = np.asarray(message_erasures)
+        if message_erasures.dtype == bool:
+            erasures_mask[i] = message_erasures
+        else:
+            erasures_mask[i, message_erasures.astype(np.intp)] = True
+
+    # Expander graph decoding
+    with stage(stats, 'expander'):
+        partially_decoded_msg, new_erasures = decode_expander(expander_graph, encoded_messages, erasures_mask)
+
+    # the split of the blocks to the word and the check symbols of the vertices
     if ramanujan_graph is None:
-        ramanujan_graph = ramanujan(pr, qr)  # generate the ramanujan graph
+        ramanujan_graph = cached_ramanujan(pr, qr)  # generate the ramanujan graph
     gamma = epsilon / 4
     d = ramanujan_graph.degree
     N = ramanujan_graph.num_of_nodes // 2
     k = ramanujan_graph.num_of_edges
     half_gamma_d = round(gamma * d + 0.5) // 2
 
-    codeword = (word[:k], [word[k + half_gamma_d * i: k + half_gamma_d * (i + 1)] for i in range(2 * N)])
+    # Short-circuit: a codeword without erasures whose blocks all have zero syndromes is intact,
+    # and its message is the beginning of the blocks. If the check symbols of the last vertices are cut at the end
+    # of the blocks, the full decoding can't verify them, so these codewords are always decoded
+    decoded = [None] * num_of_messages
+    if stats is not None:
+        stats.codewords += num_of_messages
+    if k + half_gamma_d * 2 * N <= n * b:
+        with stage(stats, 'blocks'):
+            dirty = rs_calc_syndromes_batch(partially_decoded_msg, int(delta - b), c_exp).any(axis=(1, 2))
+        clean = np.flatnonzero(~dirty & ~erasures_mask.any(axis=1))
+        for index in clean:
+            decoded[index] = bytearray(partially_decoded_msg[index, :, :b].reshape(-1)[:k]), True
+        if stats is not None:
+            stats.clean_codewords += len(clean)
+        dirty = np.flatnonzero([word is None for word in decoded])
+        partially_decoded_msg, new_erasures = partially_decoded_msg[dirty], new_erasures[dirty]
+    else:
+        dirty = np.arange(num_of_messages)
+    if len(dirty) == 0:
+        return decoded
+
+    # Block decoding using Reed-Solomon, all the blocks at once (split between the workers)
+    with stage(stats, 'blocks'):
+        if only_erasures:
+            # no errors, so only the blocks with erasures are solved, and the blocks that fail are erasures of the word
+            blocks, blocks_success = rs_erasure_decode_batch(partially_decoded_msg.reshape(-1, delta),
+                                                             int(delta - b), new_erasures.reshape(-1, delta), c_exp)
+            words_erasures = np.repeat(~blocks_success, b).reshape(len(dirty), -1)
+        elif workers is not None and workers <= 1:
+            blocks, blocks_success, _ = rs_decode_batch(partially_decoded_msg.reshape(-1, delta), int(delta - b),
+                                                        new_erasures.reshape(-1, delta), c_exp)
+        else:
+            from parallel import rs_decode_parallel  # the processes are only needed for a parallel decoding
+            blocks, blocks_success = rs_decode_parallel(partially_decoded_msg.reshape(-1, delta), int(delta - b),
+                                                        new_erasures.reshape(-1, delta), workers, c_exp)
+    if stats is not None:
+        stats.blocks += len(blocks)
+        stats.blocks_failed += int(np.count_nonzero(~blocks_success))
+        received = partially_decoded_msg.reshape(-1, delta)[blocks_success]
+        stats.block_symbols_corrected += int(np.count_nonzero(blocks[blocks_success] != received))
 
-    # left code
-    word = decode_ramanujan(ramanujan_graph, codeword, gamma / 8)
-    return word
+    # concatenate the blocks, if a block couldn't be decoded, it is an arbitrary block
+    with stage(stats, 'split'):
+        words = blocks[:, :b].reshape(len(dirty), -1)
+        codewords = [(word[:k], [word[k + half_gamma_d * i: k + half_gamma_d * (i + 1)] for i in range(2 * N)])
+                     for word in words]
+
+    # left code, all the codewords together
+    if only_erasures:
+        codewords_erasures = [(word_erasures[:k], [word_erasures[k + half_gamma_d * i: k + half_gamma_d * (i + 1)]
+                                                   for i in range(2 * N)]) for word_erasures in words_erasures]
+        left_decoded = decode_ramanujan_erasures_many(ramanujan_graph, codewords, gamma / 8, codewords_erasures, stats,
+                                                      c_exp)
+    else:
+        left_decoded = decode_ramanujan_many(ramanujan_graph, codewords, gamma / 8, stats, workers, c_exp)
+    for index, result in zip(dirty.tolist(), left_decoded):
+        decoded[index] = result
+    return decoded
+
+
+class BlockReader:
+    """
+    Reads blocks of the word after the left code from a codeword, decoding only the blocks that are asked for.
+    Each block gathers its delta symbols through the expander routing and is decoded with Reed-Solomon once
+    """
+
+    def __init__(self, encoded_message, b, expander_graph, erasures=(), c_exp=8):
+        """
+        :param encoded_message: the codeword, a Codeword or any buffer of the n x delta symbols
+        :param b: the size of each block before Reed-Solomon encoding
+        :param expander_graph: the expander graph
+        :param erasures: Optional position of erasures in the codeword, or a boolean mask of the erased symbols
+        :param c_exp: Optional exponent of the field of the symbols, parameters.field_exponent of the code
+        """
+        self.delta = expander_graph.degree
+        self.b = b
+        self.c_exp = c_exp
+        n = expander_graph.num_of_nodes // 2
+        self.symbols = Codeword(encoded_message, self.delta, symbol_dtype(c_exp)).reshape(-1)
+        self.erased = np.zeros(n, dtype=bool)
+        erasures = np.asarray(erasures)
+        if erasures.dtype == bool:
+            self.erased[:] = erasures
+        else:
+            self.erased[erasures.astype(np.intp)] = True
+        self.index = routing_plan(expander_graph)[1].reshape(n, self.delta)  # the symbols of each block
+        self.blocks = {}  # the decoded data of each block read so far
+        self.failed = set()  # the blocks that could not be decoded
+
+    def read(self, positions):
+        """
+        This function reads symbols of the word, decoding the blocks they are in if they weren't decoded yet
+        :param positions: array of positions in the word
+        :return: the symbols, a symbol of a block that could not be decoded is as received
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        new = [block for block in np.unique(positions // self.b).tolist() if block not in self.blocks]
+        if new:
+            index = self.index[new]
+            decoded, success, _ = rs_decode_batch(self.symbols[index], int(self.delta - self.b),
+                                                  self.erased[index // self.delta], self.c_exp)
+            for block, data, ok in zip(new, decoded[:, :self.b], success):
+                self.blocks[block] = data
+                if not ok:
+                    self.failed.add(block)
+        return np.array([self.blocks[position // self.b][position % self.b] for position in positions.tolist()],
+                        dtype=symbol_dtype(self.c_exp))
+
+    def failed_positions(self, positions):
+        """
+        This function finds which of the positions are in blocks that could not be decoded (after reading them)
+        :param positions: array of positions in the word
+        :return: the indices of these positions in the array
+        """
+        return np.flatnonzero(np.isin(np.asarray(positions) // self.b, list(self.failed)))
+
+
+def linear_decode_range(encoded_message, start, stop, pr, qr, pe, qe, b, epsilon, ramanujan_graph=None,
+                        expander_graph=None, erasures=[]):
+    """
+    Decodes only the bytes start to stop of the message, with cost proportional to the range and not to the codeword.
+    The code is systematic, so the range is read from the few blocks it is in. Symbols in blocks that can't be decoded
+    are decoded by one of the two vertices of their edge in the Ramanujan graph, which reads only its own blocks.
+    :param encoded_message: The encoded message, a Codeword or any buffer of the n x delta symbols
+    :param start: the first byte of the range in the message
+    :param stop: the end of the range in the message (not included)
+    :param pr: 'p' parameter for the ramanujan graph
+    :param qr: 'q' parameter for the ramanujan graph
+    :param pe: 'p' parameter for the expander graph
+    :param qe: 'q' parameter for the expander graph
+    :param epsilon: Small value related to the distance of the code
+    :param b: The size of each block before Reed-Solomon encoding
+    :param expander_graph: Optional pre-initialized expander graph
+    :param ramanujan_graph: Optional pre-initialized Ramanujan graph.
+    :param erasures: Optional position of erasures in the codeword, or a boolean mask of the erased symbols
+    :return: the bytes of the range, and a flag if we think they were decoded successfully
+    """
+    c_exp = field_exponent(pr, pe, epsilon)
+    if expander_graph is None:
+        expander_graph = cached_ramanujan(pe, qe)
+    if ramanujan_graph is None:
+        ramanujan_graph = cached_ramanujan(pr, qr)
+    k = ramanujan_graph.num_of_edges
+    size = np.dtype(symbol_dtype(c_exp)).itemsize  # the bytes of each symbol of the message
+    if not 0 <= start <= stop <= k * size:
+        raise ValueError("The range [%i, %i) is not in the message of length %i" % (start, stop, k * size))
+    reader = BlockReader(encoded_message, b, expander_graph, erasures, c_exp)
+    first = start // size
+    positions = np.arange(first, -(-stop // size))  # the symbols of the bytes of the range
+    range_bytes = slice(start - first * size, stop - first * size)  # the range in the bytes of these symbols
+    word = reader.read(positions)
+    unknown = reader.failed_positions(positions)
+    if len(unknown) == 0:
+        return bytearray(word.tobytes()[range_bytes]), True
+
+    # decode the vertices of the edges in the failed blocks, the symbols in failed blocks are their erasures
+    gamma_tag = epsilon / 32
+    d = ramanujan_graph.degree
+    half_gamma_d = round(epsilon / 4 * d + 0.5) // 2
+    length = len(reader.index) * b  # the length of the word after the left code
+    edges = ramanujan_graph.edges()
+    incidence = ramanujan_graph.incidence()
+    for side in range(2):  # try the left vertices, and then the right vertices of the symbols that are left
+        vertices = np.unique(edges[positions[unknown], side])
+        check_positions = [np.arange(k + half_gamma_d * x, min(k + half_gamma_d * (x + 1), length))
+                           for x in vertices.tolist()]
+        reader.read(np.concatenate([incidence[vertices].ravel()] + check_positions))  # all the blocks at once
+        decoded_vertices = {}
+        for x, check_positions_v in zip(vertices.tolist(), check_positions):
+            decoded_vertices[x] = decode_vertex(d, reader.read(incidence[x]), reader.read(check_positions_v), gamma_tag,
+                                                reader.failed_positions(incidence[x]),
+                                                reader.failed_positions(check_positions_v), c_exp)
+        still_unknown = []
+        for i in unknown.tolist():
+            x = int(edges[positions[i], side])
+            if decoded_vertices[x] is None:
+                still_unknown.append(i)
+            else:
+                word[i] = decoded_vertices[x][np.flatnonzero(incidence[x] == positions[i])[0]]
+        unknown = np.array(still_unknown, dtype=np.intp)
+        if len(unknown) == 0:
+            return bytearray(word.tobytes()[range_bytes]), True
+    return bytearray(word.tobytes()[range_bytes]), False  # both vertices of some symbols failed
+
+
+def linear_update(encoded_message, offset, new_bytes, pr, qr, pe, qe, b, epsilon, ramanujan_graph=None,
+                  expander_graph=None):
+    """
+    Changes bytes of the message in an intact codeword, without encoding the message again.
+    All the stages of the code are linear, so only the difference is encoded: the changed bytes change the redundancy
+    of the two vertices of their edges, and the changed symbols of the word change only the ecc symbols of their blocks,
+    which are written to their places in the codeword through the expander routing.
+    :param encoded_message: The codeword to change in place, an array of shape (n, delta) such as a mapped codeword file
+    :param offset: the position of the first byte to change in the message
+    :param new_bytes: the new bytes
+    :param pr: 'p' parameter for the ramanujan graph
+    :param qr: 'q' parameter for the ramanujan graph
+    :param pe: 'p' parameter for the expander graph
+    :param qe: 'q' parameter for the expander graph
+    :param epsilon: Small value related to the distance of the code
+    :param b: The size of each block before Reed-Solomon encoding
+    :param expander_graph: Optional pre-initialized expander graph
+    :param ramanujan_graph: Optional pre-initialized Ramanujan graph.
+    :return: the codeword
+    """
+    c_exp = field_exponent(pr, pe, epsilon)
+    dtype = symbol_dtype(c_exp)
+    if expander_graph is None:
+        expander_graph = cached_ramanujan(pe, qe)
+    if ramanujan_graph is None:
+        ramanujan_graph = cached_ramanujan(pr, qr)
+    k = ramanujan_graph.num_of_edges
+    size = np.dtype(dtype).itemsize  # the bytes of each symbol of the message
+    new_bytes = bytes(new_bytes)
+    if not 0 <= offset <= offset + len(new_bytes) <= k * size:
+        raise ValueError("The bytes [%i, %i) are not in the message of length %i"
+                         % (offset, offset + len(new_bytes), k * size))
+    delta = expander_graph.degree
+    symbols = encoded_message.reshape(-1)  # a view, the codeword is changed in place
+    _, decode_index = routing_plan(expander_graph)
+
+    # the difference of the message, the symbol of word position p is at decode_index[(p // b) * delta + p % b]
+    first = offset // size
+    positions = np.arange(first, -(-(offset + len(new_bytes)) // size))  # the symbols of the changed bytes
+    old_symbols = symbols[decode_index[positions // b * delta + positions % b]].astype(dtype)
+    new_symbols = bytearray(old_symbols.tobytes())  # a symbol can change only in some of its bytes
+    new_symbols[offset - first * size:offset - first * size + len(new_bytes)] = new_bytes
+    difference = old_symbols ^ np.frombuffer(new_symbols, dtype=dtype)
+    changed = np.flatnonzero(difference)
+    positions, difference = positions[changed], difference[changed]
+
+    # left code: the redundancy of a vertex is the sum of its symbols times the rows of the generator matrix
+    d = ramanujan_graph.degree
+    gamma_tag = epsilon / 32
+    rsc1_redundancy = round(gamma_tag*d + 0.5)
+    generator_matrix = vertex_generator_matrix(d, rsc1_redundancy, int(round(4*d*gamma_tag) - rsc1_redundancy), c_exp)
+    redundancy = generator_matrix.shape[1]
+    vertices = ramanujan_graph.edges()[positions].ravel()  # the two vertices of each changed edge
+    rows = np.argmax(ramanujan_graph.incidence()[vertices] == np.repeat(positions, 2)[:, None], axis=1)
+    redundancy_difference = field(c_exp).mul(np.repeat(difference, 2)[:, None], generator_matrix[rows])
+    redundancy_positions = k + vertices[:, None].astype(np.intp) * redundancy + np.arange(redundancy)
+
+    # sum the differences of the word, the same check symbol can change by a few edges of its vertex
+    word_positions, inverse = np.unique(np.concatenate((positions, redundancy_positions.ravel())),
+                                        return_inverse=True)
+    word_difference = np.zeros(len(word_positions), dtype=dtype)
+    np.bitwise_xor.at(word_difference, inverse, np.concatenate((difference, redundancy_difference.ravel())))
+    in_blocks = word_positions < len(decode_index) // delta * b  # the end of the word can be cut by the blocks
+    word_positions, word_difference = word_positions[in_blocks], word_difference[in_blocks]
+
+    # blocks: the ecc symbols of a block are its data times the parity matrix
+    blocks, inverse = np.unique(word_positions // b, return_inverse=True)
+    blocks_difference = np.zeros((len(blocks), b), dtype=dtype)
+    blocks_difference[inverse, word_positions % b] = word_difference
+    blocks_difference = np.concatenate(
+        (blocks_difference, gf_matmul(blocks_difference, parity_matrix(b, int(delta - b), c_exp), c_exp)), axis=1)
+
+    # expander code: each symbol of a block is at its place in the codeword
+    symbols[decode_index[blocks[:, None] * delta + np.arange(delta)]] ^= blocks_difference
+    return encoded_message
+
+
+def linear_verify(encoded_message, pe, qe, b, expander_graph=None, c_exp=8):
+    """
+    Checks if a codeword is intact, without decoding it: all the blocks must have zero Reed-Solomon syndromes.
+    :param encoded_message: The encoded message to check, a Codeword or any buffer of the n x delta symbols
+    :param pe: 'p' parameter for the expander graph
+    :param qe: 'q' parameter for the expander graph
+    :param b: The size of each block before Reed-Solomon encoding
+    :param expander_graph: Optional pre-initialized expander graph
+    :param c_exp: Optional exponent of the field of the symbols, parameters.field_exponent of the code
+    :return: True if all the blocks are codewords
+    """
+    if expander_graph is None:
+        expander_graph = cached_ramanujan(pe, qe)
+    blocks, _ = decode_expander(expander_graph, Codeword(encoded_message, pe + 1, symbol_dtype(c_exp)), [])
+    return not rs_calc_syndromes_batch(blocks, int(expander_graph.degree - b), c_exp).any()
 
 
 def print_info(params):
@@ -138,7 +460,8 @@ def print_info(params):
     n = q*(q*q-1)
     print(f"Rate = {params[4]}\nepsilon = {params[5]}\n"
           f"Code can correct: {(1-params[4]-params[5])*100}% of errors")
-    print(f"Alphabet size of message: 2^8\nAlphabet size of code: 2^{8+params[1]+1}")
+    c_exp = field_exponent(params[0], params[1], params[5])
+    print(f"Alphabet size of message: 2^{c_exp}\nAlphabet size of code: 2^{c_exp*(params[1]+1)}")
     print(f"Message length: {params[-1]}\nCode Length: {n}")
     print(f"Ramanujan graph: {n} nodes, {n//2*(params[0]+1)} edges\n"
           f"Expander graph: {n} nodes, {n//2*(params[1]+1)} edges")
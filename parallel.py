@@ -0,0 +1,226 @@
+import atexit
+import os
+import threading
+from multiprocessing import get_context, shared_memory
+import numpy as np
+from left_code import decode_vertices
+from rs_batch import rs_decode_batch, symbol_dtype
+
+
+def share_array(array):
+    """
+    This function copies an array to a new block of shared memory
+    :param array: the array to share
+    :return: the shared memory, and the array viewing it
+    """
+    memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+    shared[...] = array
+    return memory, shared
+
+
+def attach_array(name, shape, dtype):
+    """
+    This function views a block of shared memory that was created by another process as an array
+    :param name: the name of the shared memory
+    :param shape: the shape of the array
+    :param dtype: the type of the array
+    :return: the shared memory, and the array viewing it
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+_pools = {}  # the worker processes of rs_decode_parallel, by the number of workers
+_pools_lock = threading.Lock()
+
+
+def worker_pool(workers):
+    """
+    This function returns the pool of worker processes for the number of workers, it is created on the first call
+    and reused by the next calls, so the processes are started once and not for every decoding
+    :param workers: the number of processes
+    :return: the pool
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            if not _pools:
+                atexit.register(close_pools)
+            pool = _pools[workers] = get_context().Pool(workers)
+        return pool
+
+
+def close_pools():
+    """
+    This function stops the worker processes of rs_decode_parallel, the next call starts them again
+    :return: None
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.terminate()
+            pool.join()
+        _pools.clear()
+
+
+def decode_rows(task):
+    """
+    This function runs in a worker process and decodes a range of rows of the shared codewords,
+    the decoded rows and the success flags are written to the shared outputs
+    :param task: the names of the shared memories, the shape of the codewords, nsym, the exponent of the field
+                 and the range of rows
+    :return: None
+    """
+    (codewords_name, erasures_name, decoded_name, success_name), shape, nsym, c_exp, start, stop = task
+    memories = []
+    codewords = erasures = decoded = success = None
+    try:
+        memory, codewords = attach_array(codewords_name, shape, symbol_dtype(c_exp))
+        memories.append(memory)
+        if erasures_name is not None:
+            memory, erasures = attach_array(erasures_name, shape, bool)
+            memories.append(memory)
+            erasures = erasures[start:stop]
+        memory, decoded = attach_array(decoded_name, shape, symbol_dtype(c_exp))
+        memories.append(memory)
+        memory, success = attach_array(success_name, shape[:1], bool)
+        memories.append(memory)
+        decoded[start:stop], success[start:stop], _ = rs_decode_batch(codewords[start:stop], nsym, erasures, c_exp)
+    finally:
+        codewords = erasures = decoded = success = None  # release the views before closing the memories
+        for memory in memories:
+            memory.close()
+
+
+def rs_decode_parallel(codewords, nsym, erasures=None, workers=1, c_exp=8):
+    """
+    This function decodes the codewords like rs_decode_batch, with the rows split between worker processes.
+    The processes are started by the first call and reused (see worker_pool). The codewords are passed to the workers
+    through shared memory, so they are not pickled, it is created for each call and costs one copy of the codewords
+    :param codewords: matrix of the codewords, one codeword in each row
+    :param nsym: the number of ecc symbols
+    :param erasures: optional boolean matrix of the erased positions in each codeword
+    :param workers: the number of processes, None for the number of cpus
+    :param c_exp: the exponent of the field of the symbols
+    :return: decoded - the corrected codewords, the codewords that could not be corrected are returned as received
+             success - boolean array, whether each codeword was corrected
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    codewords = np.asarray(codewords, dtype=symbol_dtype(c_exp))
+    if workers <= 1 or len(codewords) < 2:
+        decoded, success, _ = rs_decode_batch(codewords, nsym, erasures, c_exp)
+        return decoded, success
+
+    memories = []
+    try:
+        memory, _ = share_array(codewords)
+        memories.append(memory)
+        erasures_name = None
+        if erasures is not None:
+            memory, _ = share_array(np.asarray(erasures, dtype=bool))
+            memories.append(memory)
+            erasures_name = memory.name
+        memory, decoded = share_array(np.zeros_like(codewords))
+        memories.append(memory)
+        memory, success = share_array(np.zeros(len(codewords), dtype=bool))
+        memories.append(memory)
+        names = (memories[0].name, erasures_name, memories[-2].name, memories[-1].name)
+
+        # a few ranges for each worker, so a worker with many dirty rows doesn't hold the rest
+        bounds = np.linspace(0, len(codewords), min(4 * workers, len(codewords)) + 1).astype(int)
+        tasks = [(names, codewords.shape, nsym, c_exp, start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        worker_pool(workers).map(decode_rows, tasks)
+        result = decoded.copy(), success.copy()
+    finally:
+        decoded = success = None  # release the views before closing the memories
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+    return result
+
+
+_vertex_arrays = {}  # the shared arrays of the vertex decoding in a worker process
+
+
+def attach_vertex_arrays(specs):
+    """
+    This function runs once in each worker process of a VertexPool, and views the shared arrays
+    :param specs: dictionary of the name, shape and type of each shared array
+    :return: None
+    """
+    for key, (name, shape, dtype) in specs.items():
+        _vertex_arrays[key] = attach_array(name, shape, dtype)
+
+
+def decode_vertices_task(task):
+    """
+    This function runs in a worker process and decodes vertices of one round against the shared words,
+    the corrections are written to the shared words
+    :param task: the rows of the vertices, the number of ecc symbols of rsc1 and the exponent of the field
+    :return: the rows that were decoded
+    """
+    rows, nsym, c_exp = task
+    incidence, words, check_symbols = (_vertex_arrays[key][1] for key in ('incidence', 'words', 'check_symbols'))
+    return decode_vertices(incidence, words, check_symbols, rows, nsym, c_exp)
+
+
+class VertexPool:
+    """
+    Worker processes for the vertex loop of the left decoder.
+    The words, the incidence and the check symbols are in shared memory, the vertices are split between the workers
+    by their rows, so each round only the vertices to decode and the decoded vertices are passed between processes.
+    The vertices of a round are on the same side of the graph, so they don't share edges and the workers
+    write to different symbols of the words
+    """
+
+    def __init__(self, incidence, words, check_symbols, nsym, workers=None, c_exp=8):
+        """
+        :param incidence: the edges of each vertex
+        :param words: matrix with one word in each row, it is copied to shared memory
+        :param check_symbols: array of shape (words, vertices, nsym), the decoded rsc1 redundancy of each vertex
+        :param nsym: the number of ecc symbols of rsc1
+        :param workers: the number of processes, None for the number of cpus
+        :param c_exp: the exponent of the field of the symbols
+        """
+        if workers is None:
+            workers = os.cpu_count()
+        self.workers = workers
+        self.nsym = nsym
+        self.c_exp = c_exp
+        self.bounds = np.linspace(0, len(words) * len(incidence), workers + 1).astype(int)  # the rows of each worker
+        self.memories = []
+        specs = {}
+        try:
+            for key, array in (('incidence', incidence), ('words', words), ('check_symbols', check_symbols)):
+                memory, shared = share_array(np.ascontiguousarray(array))
+                self.memories.append(memory)
+                specs[key] = (memory.name, shared.shape, shared.dtype)
+                if key == 'words':
+                    self.words = shared
+            self.pool = get_context().Pool(workers, attach_vertex_arrays, (specs,))
+        except BaseException:
+            self.close()
+            raise
+
+    def decode(self, rows):
+        """
+        This function decodes vertices of one side, like decode_vertices, split between the workers
+        :param rows: the sorted rows of the vertices to decode
+        :return: the rows that were decoded
+        """
+        parts = np.split(rows, np.searchsorted(rows, self.bounds[1:-1]))
+        decoded = self.pool.map(decode_vertices_task, [(part, self.nsym, self.c_exp) for part in parts if len(part)])
+        return np.concatenate(decoded) if decoded else rows[:0]
+
+    def close(self):
+        pool = getattr(self, 'pool', None)
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+            self.pool = None
+        self.words = None  # release the views before closing the memories
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
+        self.memories = []
@@ -1,3 +1,14 @@
+import functools
+import os
+import tempfile
+import numpy as np
+from rs_batch import FIELD_CHARAC, WIDE_C_EXP
+
+CATALOGUE_VERSION = 2
+MAX_K = 15000000  # the default max code dimension (in bytes)
+WIDE_MAX_K = 300000000  # the default max code dimension of the parameters with symbols of two bytes
+
+
 def primes_1_mod_4(limit):
     """
     This function generate a list of prime numbers up to `limit` that are equivalent to 1 mod 4
@@ -20,6 +31,34 @@ def primes_1_mod_4(limit):
     return primes_1_mod_4_list
 
 
+def field_exponent(pr, pe, epsilon):
+    """
+    This function chooses the field of the symbols of the code. The Reed-Solomon codes of the vertices (d symbols
+    and the rsc1 redundancy) and of the blocks (delta symbols) must be shorter than the size of the field, so GF(2^8)
+    is used when they fit in 255 symbols, and GF(2^16) with symbols of two bytes for larger degrees
+    :param pr: 'p' parameter for the ramanujan graph
+    :param pe: 'p' parameter for the expander graph
+    :param epsilon: the distance from MDS code
+    :return: the exponent of the field, 8 or 16
+    """
+    d = pr + 1
+    rsc1_redundancy = round(epsilon / 32 * d + 0.5)
+    if d + rsc1_redundancy <= FIELD_CHARAC and pe + 1 <= FIELD_CHARAC:
+        return 8
+    return WIDE_C_EXP
+
+
+def symbol_size(pr, pe, epsilon):
+    """
+    This function computes the number of bytes in each symbol of the code
+    :param pr: 'p' parameter for the ramanujan graph
+    :param pe: 'p' parameter for the expander graph
+    :param epsilon: the distance from MDS code
+    :return: 1 for GF(2^8), 2 for GF(2^16)
+    """
+    return field_exponent(pr, pe, epsilon) // 8
+
+
 def check_legendre_symbols(p, q):
     """
     This function calculate the legendre symbol of (p/q)
@@ -33,6 +72,7 @@ def check_legendre_symbols(p, q):
     return False
 
 
+@functools.lru_cache(maxsize=None)
 def find_k_p_q(limit):
     """
     This function finds pairs of p, q - primes 1 mod 4 with legendre symbol -1, that can be used for Ramanujan graph
@@ -41,6 +81,7 @@ def find_k_p_q(limit):
         - k_p_q_dict: A dictionary where the key is k, and the value is a list [p, q].
         - dict_p_q: A dictionary where the key is q, and the value is a list of primes p matching q.
         - dict_q_p: A dictionary where the key is p, and the value is a list of primes q matching p.
+    The result is cached, so don't change it
     """
     primes_1_mod_4_list = primes_1_mod_4(limit)
     data = []
@@ -156,7 +197,153 @@ def choose_params_by_exact_rate_epsilon(epsilon, r, padding=False, prime_limit=2
     return k_list
 
 
-def choose_params(r, epsilon, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=15000000):
+class ParameterCatalogue:
+    """
+    All the parameters that choose_params can return for a prime limit, for any r and epsilon.
+    For each pr there are a few epsilons that satisfy epsilon/32*d is whole, and the rows are in the order that
+    choose_params scans them, so a query returns the same list in the same order.
+    k is the length of the message in bytes, for the degrees that need symbols of two bytes it is twice the edges
+    """
+
+    COLUMNS = ('pr', 'qr', 'pe', 'qe', 'b', 'r', 'epsilon', 'k', 'j')
+
+    def __init__(self, columns):
+        """
+        :param columns: dictionary of the columns of the catalogue, j is the index of epsilon (epsilon = 32j/d)
+        """
+        for name in self.COLUMNS:
+            setattr(self, name, np.asarray(columns[name]))
+        self.rows = list(zip(*(getattr(self, name).tolist() for name in self.COLUMNS[:-1])))
+        self.wide = self.k > self.qr * (self.qr * self.qr - 1) * (self.pr + 1) // 2  # more bytes than edges
+        self.by_k = np.argsort(self.k, kind='stable')  # index for the k ranges
+        self.sorted_k = self.k[self.by_k]
+        self.by_shape = {}  # index for the (delta, n) shapes
+        n = self.qe * (self.qe * self.qe - 1) // 2
+        for i, shape in enumerate(zip((self.pe + 1).tolist(), n.tolist())):
+            self.by_shape.setdefault(shape, []).append(i)
+
+    @classmethod
+    def build(cls, prime_limit=200):
+        """
+        This function enumerates the parameters, like choose_params does for every epsilon
+        :param prime_limit: the max value of primes for the graphs
+        :return: the catalogue
+        """
+        _, ps_for_each_q, qs_for_each_p = find_k_p_q(prime_limit)  # dictionaries used
+        columns = {name: [] for name in cls.COLUMNS}
+        for pr in qs_for_each_p.keys():
+            d = pr + 1
+            for j in range(1, -(-d // 32)):  # the epsilons below 1 that satisfy epsilon/32*d is whole
+                epsilon_opt = 32 * j / d
+                for q in qs_for_each_p[pr]:
+                    k = q * (q*q - 1) * (pr + 1) // 2
+                    n_tag = (1 + epsilon_opt / 4) * k  # the length of the word after the left code
+                    n = q * (q*q - 1) // 2  # number of vertices in each side, number of blocks
+                    b = round(n_tag / n)  # the size of each block
+                    for p in ps_for_each_q[q]:
+                        r_opt = 4*b/((p + 1)*(4+epsilon_opt))
+                        if r_opt+epsilon_opt < 1:
+                            k_bytes = k * symbol_size(pr, p, epsilon_opt)
+                            for name, value in zip(cls.COLUMNS, (pr, q, p, q, b, r_opt, epsilon_opt, k_bytes, j)):
+                                columns[name].append(value)
+        return cls(columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as file:
+            return cls({name: file[name] for name in cls.COLUMNS})
+
+    def save(self, path):
+        """
+        This function saves the catalogue, the file is replaced atomically
+        :param path: the path of the file
+        :return: None
+        """
+        file, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(file, 'wb') as file:
+                np.savez(file, **{name: getattr(self, name) for name in self.COLUMNS})
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def __len__(self):
+        return len(self.rows)
+
+    def choose(self, r, epsilon, r_dist=0.1, eps_dist=0.1, max_k=None, shape=None):
+        """
+        This function finds the fitting parameters, the same as choose_params
+        :param r: rate wanted
+        :param epsilon: epsilon wanted
+        :param r_dist: max distance from r wanted
+        :param eps_dist: max distance from epsilon wanted
+        :param max_k: the max value of code dimension, None for MAX_K and WIDE_MAX_K for symbols of two bytes
+        :param shape: optional (delta, n) shape of the codeword
+        :return: list with fitting parameters
+        """
+        rows = self.shape_rows(shape)
+        j = self.j[rows]
+        epsilon_opt = self.epsilon[rows]
+        r_opt = self.r[rows]
+        mask = j == np.round(epsilon * (self.pr[rows] + 1) / 32)  # the epsilon choose_params creates for d
+        mask &= np.abs(epsilon - epsilon_opt) < eps_dist
+        mask &= self.k[rows] <= (np.where(self.wide[rows], WIDE_MAX_K, MAX_K) if max_k is None else max_k)
+        mask &= (r_opt > r) & (r_opt - r < r_dist)
+        return [self.rows[i] for i in rows[mask]]
+
+    def shape_rows(self, shape=None):
+        if shape is None:
+            return np.arange(len(self.rows))
+        return np.array(self.by_shape.get(tuple(shape), []), dtype=np.intp)
+
+    def query(self, k_range=None, r_range=None, eps_range=None, shape=None):
+        """
+        This function finds all the parameters in the given ranges (including the bounds)
+        :param k_range: optional (min, max) of the code dimension
+        :param r_range: optional (min, max) of the rate
+        :param eps_range: optional (min, max) of epsilon
+        :param shape: optional (delta, n) shape of the codeword
+        :return: list with the parameters, in the order of the catalogue
+        """
+        if k_range is None:
+            rows = self.shape_rows(shape)
+        else:
+            start = np.searchsorted(self.sorted_k, k_range[0], side='left')
+            stop = np.searchsorted(self.sorted_k, k_range[1], side='right')
+            rows = np.sort(self.by_k[start:stop])
+            if shape is not None:
+                rows = np.intersect1d(rows, self.shape_rows(shape))
+        mask = np.ones(len(rows), dtype=bool)
+        for column, value_range in ((self.r, r_range), (self.epsilon, eps_range)):
+            if value_range is not None:
+                mask &= (column[rows] >= value_range[0]) & (column[rows] <= value_range[1])
+        return [self.rows[i] for i in rows[mask]]
+
+
+@functools.lru_cache(maxsize=None)
+def catalogue(prime_limit=200, cache_dir=None):
+    """
+    This function returns the catalogue of the parameters for a prime limit, it is built once in each process.
+    If cache_dir is given, the catalogue is also saved there and loaded by the next processes
+    :param prime_limit: the max value of primes for the graphs
+    :param cache_dir: optional directory for the catalogue file
+    :return: the catalogue
+    """
+    if cache_dir is None:
+        return ParameterCatalogue.build(prime_limit)
+    path = os.path.join(cache_dir, 'params-%i-v%i.npz' % (prime_limit, CATALOGUE_VERSION))
+    try:
+        return ParameterCatalogue.load(path)
+    except (OSError, ValueError, KeyError):
+        pass  # no catalogue yet, or a broken file
+    result = ParameterCatalogue.build(prime_limit)
+    os.makedirs(cache_dir, exist_ok=True)
+    result.save(path)
+    return result
+
+
+def choose_params(r, epsilon, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=None):
     """
     This function finds the fitting parameters
     :param r: rate wanted
@@ -164,32 +351,7 @@ def choose_params(r, epsilon, r_dist=0.1, eps_dist=0.1, prime_limit=200, max_k=1
     :param r_dist: max distance from r wanted
     :param eps_dist: max distance from epsilon wanted
     :param prime_limit: the max value of primes for the graphs
-    :param max_k: the max value of code dimension
+    :param max_k: the max value of code dimension, None for MAX_K and WIDE_MAX_K for symbols of two bytes
     :return: list with fitting parameters
     """
-    k_p_q_dict, ps_for_each_q, qs_for_each_p = find_k_p_q(prime_limit)  # dictionaries used
-    d_list = [p+1 for p in qs_for_each_p.keys()]
-    good_prs = []
-    for d in d_list:
-        epsilon_opt = 32 * round(epsilon*d/32) / d  # create epsilon that satisfies epsilon/32*d is whole
-        if epsilon_opt != 0 and abs(epsilon-epsilon_opt) < eps_dist:
-            good_prs.append((d-1, epsilon_opt))
-
-    params = []
-    for pr, epsilon_opt in good_prs:
-        q_list = qs_for_each_p[pr]
-        for q in q_list:
-            k = q * (q*q - 1) * (pr + 1) // 2
-            if k > max_k:  # takes very long time to encode
-                continue
-            n_tag = (1 + epsilon_opt / 4) * k  # the length of the word after the left code
-            n = q * (q*q - 1) // 2  # number of vertices in each side, number of blocks
-            b = round(n_tag / n)  # the size of each block
-
-            # find the matching p for the expander, s.t delta > b and r + epsilon < 1
-            ps_for_q = ps_for_each_q[q]
-            for p in ps_for_q:  # the list is sorted
-                r_opt = 4*b/((p + 1)*(4+epsilon_opt))
-                if r_opt+epsilon_opt < 1 and r_opt > r and r_opt-r < r_dist:
-                    params.append((pr, q, p, q, b, r_opt, epsilon_opt, k))
-    return params
+    return catalogue(prime_limit).choose(r, epsilon, r_dist, eps_dist, max_k)
@@ -0,0 +1,486 @@
+import functools
+import numpy as np
+from reedsolo import ReedSolomonError, find_prime_polys
+
+PRIM = 0x11d  # the primitive polynomial reedsolo uses for GF(2^8)
+FIELD_CHARAC = 255
+WIDE_C_EXP = 16  # the exponent of the field of the wide symbols, GF(2^16)
+MATRIX_CACHE_SIZE = 64  # the number of matrices of each kind that are kept, for the lengths in use
+
+
+def init_tables(prim=PRIM, c_exp=8):
+    """
+    This function computes the log and antilog tables of GF(2^c_exp), with generator 2 as in reedsolo.
+    The log of 0 is set to 2*charac, and every sum of logs with it falls on the zeros at the end of the antilog table,
+    so multiplications don't need to check for zeros
+    :param prim: the primitive polynomial
+    :param c_exp: the exponent of the field
+    :return: exp - antilog table of length 4*charac+1, log - log table
+    """
+    charac = 2 ** c_exp - 1
+    exp = np.zeros(4 * charac + 1, dtype=symbol_dtype(c_exp))
+    log = np.zeros(charac + 1, dtype=np.int16 if c_exp <= 8 else np.int32)
+    x = 1
+    for i in range(charac):
+        exp[i] = x
+        log[x] = i
+        x <<= 1  # multiply by the generator
+        if x > charac:
+            x ^= prim
+    exp[charac:2 * charac] = exp[:charac]  # the sum of two logs doesn't need a modulo
+    log[0] = 2 * charac
+    return exp, log
+
+
+def symbol_dtype(c_exp=8):
+    """
+    This function returns the type of the symbols of GF(2^c_exp)
+    :param c_exp: the exponent of the field
+    :return: the numpy type
+    """
+    return np.uint8 if c_exp <= 8 else np.dtype('<u2')  # little endian, so the codewords are the same on every machine
+
+
+def bytes_to_symbols(data, c_exp=8):
+    """
+    This function views bytes as symbols of GF(2^c_exp), a symbol of GF(2^16) is two bytes in little endian.
+    The bytes of GF(2^8) are returned as they are
+    :param data: bytes, or a uint8 matrix with one message in each row
+    :param c_exp: the exponent of the field
+    :return: the symbols
+    """
+    if c_exp <= 8:
+        return data
+    if not isinstance(data, np.ndarray):
+        data = np.frombuffer(bytes(data), dtype=np.uint8)
+    size = np.dtype(symbol_dtype(c_exp)).itemsize
+    if data.shape[-1] % size:
+        raise ValueError("The length of the data (%i) is not a multiple of the symbol size %i" % (data.shape[-1], size))
+    return np.ascontiguousarray(data, dtype=np.uint8).view(symbol_dtype(c_exp))
+
+
+class Field:
+    """
+    The tables of GF(2^c_exp) with generator 2 and the primitive polynomial reedsolo uses.
+    GF(2^8) has a full multiplication table, the larger fields multiply with the log tables
+    """
+
+    def __init__(self, c_exp=8):
+        """
+        :param c_exp: the exponent of the field
+        """
+        self.c_exp = c_exp
+        self.charac = 2 ** c_exp - 1
+        self.dtype = symbol_dtype(c_exp)
+        # reedsolo finds the primitive polynomial of the other fields the same way
+        self.prim = PRIM if c_exp == 8 else find_prime_polys(generator=2, c_exp=c_exp, fast_primes=True, single=True)
+        self.exp, self.log = init_tables(self.prim, c_exp)
+        self.inv = self.exp[(self.charac - self.log) % self.charac]  # the inverses (the inverse of 0 is not used)
+        self.mul_table = self.exp[self.log[:, None] + self.log[None, :]] if c_exp <= 8 else None
+
+    def mul(self, a, b):
+        """
+        This function multiplies arrays of elements of the field, with numpy broadcasting
+        :param a: array of elements
+        :param b: array of elements
+        :return: the elementwise products
+        """
+        if self.mul_table is not None:
+            return self.mul_table[a, b]
+        return self.exp[self.log[a] + self.log[b]]
+
+
+@functools.lru_cache(maxsize=None)
+def field(c_exp=8):
+    """
+    This function keeps one Field for each exponent
+    :param c_exp: the exponent of the field
+    :return: the field
+    """
+    return Field(c_exp)
+
+
+GF_EXP, GF_LOG = field(8).exp, field(8).log
+GF_MUL = field(8).mul_table  # the multiplication table
+GF_INV = field(8).inv
+
+
+def gf_mul(a, b, c_exp=8):
+    """
+    This function multiplies arrays of elements of GF(2^c_exp), with numpy broadcasting
+    :param a: array of elements
+    :param b: array of elements
+    :param c_exp: the exponent of the field
+    :return: the elementwise products
+    """
+    gf = field(c_exp)
+    return gf.exp[gf.log[a] + gf.log[b]]
+
+
+def gf_matmul(a, b, c_exp=8):
+    """
+    This function multiplies matrices over GF(2^c_exp)
+    :param a: matrix of shape (..., rows, inner)
+    :param b: matrix of shape (inner, columns)
+    :param c_exp: the exponent of the field
+    :return: the product, of shape (..., rows, columns)
+    """
+    gf = field(c_exp)
+    a = np.asarray(a, dtype=gf.dtype)
+    b = np.asarray(b, dtype=gf.dtype)
+    product = np.zeros(a.shape[:-1] + b.shape[-1:], dtype=gf.dtype)
+    low_bytes = np.arange(256, dtype=gf.dtype)
+    split = np.prod(a.shape[:-1]) > len(low_bytes)  # the tables of the bytes are worth it for many rows
+    for j in range(b.shape[0]):
+        if gf.mul_table is not None:
+            # the products of row j of b with all the elements, and each row of a takes the one of its j-th element
+            product ^= np.take(gf.mul_table[:, b[j]], a[..., j], axis=0)
+        elif not split:
+            product ^= gf.mul(a[..., j, None], b[j])
+        else:
+            # the same with the two bytes of the elements, the product is linear so a = high * 256 + low
+            # is multiplied as (high * 256) * b ^ low * b, from two tables of 256 rows
+            low_products = gf.mul(low_bytes[:, None], b[j])
+            high_products = gf.mul((low_bytes << 8)[:, None], b[j])
+            product ^= np.take(low_products, a[..., j] & 0xff, axis=0)
+            product ^= np.take(high_products, a[..., j] >> 8, axis=0)
+    return product
+
+
+@functools.lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def generator_poly(nsym, c_exp=8):
+    """
+    This function computes the generator polynomial of Reed-Solomon with nsym ecc symbols, as in reedsolo
+    :param nsym: the number of ecc symbols
+    :param c_exp: the exponent of the field
+    :return: the coefficients of the polynomial, from the highest degree
+    """
+    gf = field(c_exp)
+    gen = np.ones(1, dtype=gf.dtype)
+    for i in range(nsym):
+        # multiply by (x - 2^i)
+        shifted = np.append(gen, 0).astype(gf.dtype)
+        shifted[1:] ^= gf.mul(gen, gf.exp[i])
+        gen = shifted
+    gen.setflags(write=False)
+    return gen
+
+
+def rs_encode_batch(messages, nsym, c_exp=8):
+    """
+    This function encodes all the messages with systematic Reed-Solomon at once,
+    the codewords are the same as RSCodec(nsym, nsize=2^c_exp-1, c_exp=c_exp).encode of each message
+    :param messages: matrix of the messages, one message in each row
+    :param nsym: the number of ecc symbols
+    :param c_exp: the exponent of the field
+    :return: matrix of the codewords, the message followed by the ecc symbols in each row
+    """
+    gf = field(c_exp)
+    messages = np.asarray(messages, dtype=gf.dtype)
+    if messages.shape[-1] + nsym > gf.charac:
+        raise ValueError("Message is too long (%i when max is %i)" % (messages.shape[-1] + nsym, gf.charac))
+    gen = generator_poly(nsym, c_exp)[1:]
+    if gf.mul_table is not None:
+        gen_products = gf.mul_table[:, gen]  # the products of the generator with all the elements
+    remainder = np.zeros(messages.shape[:-1] + (nsym,), dtype=gf.dtype)
+    # polynomial division, one symbol of all the messages at a time
+    for i in range(messages.shape[-1]):
+        coef = messages[..., i] ^ remainder[..., 0]
+        remainder[..., :-1] = remainder[..., 1:]
+        remainder[..., -1] = 0
+        if gf.mul_table is not None:
+            remainder ^= np.take(gen_products, coef, axis=0)
+        else:
+            remainder ^= gf.mul(coef[..., None], gen)
+    return np.concatenate((messages, remainder), axis=-1)
+
+
+@functools.lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def parity_matrix(length, nsym, c_exp=8):
+    """
+    This function computes the linear map from a message to its ecc symbols
+    :param length: the length of the messages
+    :param nsym: the number of ecc symbols
+    :param c_exp: the exponent of the field
+    :return: matrix of shape (length, nsym), row j is the ecc symbols of the j-th unit vector
+    """
+    matrix = rs_encode_batch(np.eye(length, dtype=symbol_dtype(c_exp)), nsym, c_exp)[:, length:]
+    matrix.setflags(write=False)
+    return matrix
+
+
+@functools.lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def syndrome_matrix(length, nsym, c_exp=8):
+    """
+    This function computes the matrix that maps a codeword to its syndromes, as rs_calc_syndromes in reedsolo
+    :param length: the length of the codewords
+    :param nsym: the number of ecc symbols
+    :param c_exp: the exponent of the field
+    :return: matrix of shape (length, nsym), the element (j, i) is 2^(i*(length-1-j))
+    """
+    gf = field(c_exp)
+    powers = np.outer(length - 1 - np.arange(length), np.arange(nsym)) % gf.charac
+    matrix = gf.exp[powers]
+    matrix.setflags(write=False)
+    return matrix
+
+
+def rs_calc_syndromes_batch(codewords, nsym, c_exp=8):
+    """
+    This function computes the syndromes of all the codewords at once (without the leading 0 reedsolo adds)
+    :param codewords: matrix of the codewords, one codeword in each row
+    :param nsym: the number of ecc symbols
+    :param c_exp: the exponent of the field
+    :return: matrix of the syndromes, the syndromes of a codeword in each row
+    """
+    return gf_matmul(codewords, syndrome_matrix(codewords.shape[-1], nsym, c_exp), c_exp)
+
+
+@functools.lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def chien_matrix(length, nsym, c_exp=8):
+    """
+    This function computes the matrix that evaluates a locator polynomial at the inverse locators of all the positions
+    :param length: the length of the codewords
+    :param nsym: the number of ecc symbols, the locators have at most nsym+1 coefficients
+    :param c_exp: the exponent of the field
+    :return: matrix of shape (nsym+1, length), the element (k, j) is 2^(-k*(length-1-j))
+    """
+    gf = field(c_exp)
+    powers = np.outer(-np.arange(nsym + 1), length - 1 - np.arange(length)) % gf.charac
+    matrix = gf.exp[powers]
+    matrix.setflags(write=False)
+    return matrix
+
+
+def gf_poly_eval_batch(coefficients, points, c_exp=8):
+    """
+    This function evaluates polynomials at points, one polynomial and one point in each row, with Horner's method
+    :param coefficients: matrix of the coefficients from the lowest degree, one polynomial in each row
+    :param points: array of the points
+    :param c_exp: the exponent of the field
+    :return: array of the values
+    """
+    gf = field(c_exp)
+    value = np.zeros(len(points), dtype=gf.dtype)
+    for i in range(coefficients.shape[1] - 1, -1, -1):
+        value = gf.mul(value, points) ^ coefficients[:, i]
+    return value
+
+
+def rs_correct_batch(codewords, nsym, erasures=None, c_exp=8):
+    """
+    This function corrects the errors and the erasures of all the codewords at once, with the same steps as reedsolo:
+    the erasure locator, Berlekamp-Massey for the errors, the roots of the errata locator (Chien search) and Forney
+    for the magnitudes. Every step runs on all the codewords together, one coefficient at a time, so it doesn't use
+    the globals of reedsolo (so codes of different fields can decode in parallel threads) and is much faster than
+    decoding the codewords one at a time with reedsolo.
+    A codeword is corrected only if it has at most nsym symbols of errata, counting each error twice. Such a correction
+    is unique, so it is the same as reedsolo's (reedsolo also accepts some corrections of erasures beyond this bound)
+    :param codewords: matrix of the codewords, one codeword in each row
+    :param nsym: the number of ecc symbols
+    :param erasures: optional boolean matrix of the erased positions in each codeword
+    :param c_exp: the exponent of the field
+    :return: decoded - the corrected codewords, the erasures are 0 in the codewords that could not be corrected
+             success - boolean array, whether each codeword was corrected
+             errata - for each codeword, the positions of the erasures and then of the errors from the last,
+                      as reedsolo returns them, None for a codeword that could not be corrected
+    """
+    gf = field(c_exp)
+    words = np.array(codewords, dtype=gf.dtype)
+    num_of_rows, length = words.shape
+    if erasures is None:
+        erasures = np.zeros(words.shape, dtype=bool)
+    erasures = np.asarray(erasures, dtype=bool)
+    words[erasures] = 0
+    erase_count = erasures.sum(axis=1)
+    success = erase_count <= nsym
+    syndromes = rs_calc_syndromes_batch(words, nsym, c_exp)
+    locators = gf.exp[(length - 1 - np.arange(length)) % gf.charac]  # the locator of each position
+
+    # the erasure locator, the product of (1 + X x) for the locators X of the erasures (coefficients from x^0)
+    errata_locator = np.zeros((num_of_rows, nsym + 1), dtype=gf.dtype)
+    errata_locator[:, 0] = 1
+    erased_first = np.argsort(~erasures, axis=1, kind='stable')
+    for e in range(min(int(erase_count.max(initial=0)), nsym)):
+        x = np.where(e < erase_count, locators[erased_first[:, e]], 0)  # 0 multiplies by 1
+        errata_locator[:, 1:] ^= gf.mul(x[:, None], errata_locator[:, :-1])
+
+    # Berlekamp-Massey, starting from the erasure locator, so the errata locator covers the errors too
+    previous = errata_locator.copy()
+    degree = erase_count.copy()
+    for r in range(nsym):
+        active = r >= erase_count  # the first erase_count steps are taken by the erasures
+        j = np.arange(r + 1)
+        discrepancy = np.bitwise_xor.reduce(gf.mul(errata_locator[:, j], syndromes[:, r - j]), axis=1)
+        discrepancy[~active] = 0
+        shifted = np.zeros_like(previous)
+        shifted[:, 1:] = previous[:, :-1]
+        update = (discrepancy != 0) & (2 * degree <= r + erase_count)
+        scaled = gf.mul(gf.inv[discrepancy][:, None], errata_locator)
+        errata_locator = errata_locator ^ gf.mul(discrepancy[:, None], shifted)
+        previous = np.where(active[:, None], np.where(update[:, None], scaled, shifted), previous)
+        degree = np.where(update, r + 1 + erase_count - degree, degree)
+    actual_degree = np.where(errata_locator.any(axis=1),
+                             nsym - np.argmax(errata_locator[:, ::-1] != 0, axis=1), 0)
+    success &= 2 * (actual_degree - erase_count) + erase_count <= nsym  # too many errors to correct
+
+    # the roots of the errata locator are the errata, there must be as many as its degree
+    roots = gf_matmul(errata_locator, chien_matrix(length, nsym, c_exp), c_exp) == 0
+    success &= roots.sum(axis=1) == actual_degree
+
+    # Forney: the magnitude of the errata at X is X * omega(1/X) / locator'(1/X), omega = syndromes * locator mod x^nsym
+    omega = np.zeros((num_of_rows, nsym), dtype=gf.dtype)
+    for k in range(nsym):
+        omega[:, k:] ^= gf.mul(errata_locator[:, k, None], syndromes[:, :nsym - k])
+    rows, positions = np.nonzero(roots & success[:, None])
+    inverse = gf.inv[locators[positions]]
+    derivative = errata_locator[rows].copy()
+    derivative[:, 0::2] = 0  # in characteristic 2 the derivative keeps the odd powers, shifted down by one
+    denominator = gf_poly_eval_batch(derivative[:, 1:], inverse, c_exp)
+    magnitudes = gf.mul(locators[positions], gf.mul(gf_poly_eval_batch(omega[rows], inverse, c_exp),
+                                                     gf.inv[denominator]))
+    success[rows[denominator == 0]] = False
+    words[rows, positions] ^= magnitudes
+    success &= ~rs_calc_syndromes_batch(words, nsym, c_exp).any(axis=1)  # the codeword is fully repaired
+
+    position_type = bytearray if c_exp <= 8 else list
+    errata = [None] * num_of_rows
+    for i in np.flatnonzero(success):
+        errors = np.flatnonzero(roots[i] & ~erasures[i])[::-1]
+        errata[i] = position_type(np.flatnonzero(erasures[i]).tolist() + errors.tolist())
+    return words, success, errata
+
+
+def rs_decode(codeword, nsym, erase_pos=None, c_exp=8):
+    """
+    This function decodes one codeword like RSCodec(nsym, nsize=2^c_exp-1, c_exp=c_exp).decode.
+    It is decoded with rs_correct_batch
+    :param codeword: the symbols of the codeword
+    :param nsym: the number of ecc symbols
+    :param erase_pos: optional positions of the erasures
+    :param c_exp: the exponent of the field
+    :return: the message, the corrected codeword (the message followed by the ecc symbols) and the positions of the
+             errata, as reedsolo returns them
+    """
+    codeword = np.asarray(codeword, dtype=symbol_dtype(c_exp))
+    erasures = np.zeros((1, len(codeword)), dtype=bool)
+    erasures[0, list(erase_pos or [])] = True
+    decoded, success, errata = rs_correct_batch(codeword[np.newaxis], nsym, erasures, c_exp)
+    if not success[0]:
+        raise ReedSolomonError("Could not correct message")
+    return decoded[0, :-nsym], decoded[0], errata[0]
+
+
+def rs_decode_batch(codewords, nsym, erasures=None, c_exp=8):
+    """
+    This function decodes all the codewords of the same length at once.
+    The syndromes are computed for all the codewords together, and only the codewords with non-zero syndromes
+    are corrected, together with rs_correct_batch,
+    so each row gets the same result as RSCodec(nsym, nsize=2^c_exp-1, c_exp=c_exp).decode
+    :param codewords: matrix of the codewords, one codeword in each row
+    :param nsym: the number of ecc symbols
+    :param erasures: optional boolean matrix of the erased positions in each codeword
+    :param c_exp: the exponent of the field
+    :return: decoded - the corrected codewords (the message followed by the ecc symbols),
+                       the codewords that could not be corrected are returned as received
+             success - boolean array, whether each codeword was corrected
+             errata - for each codeword, the positions of the erasures and the errors as reedsolo returns them,
+                      None for a codeword that could not be corrected
+    """
+    received = np.asarray(codewords, dtype=symbol_dtype(c_exp))
+    decoded = received.copy()
+    num_of_rows = len(decoded)
+    if erasures is None:
+        success = np.ones(num_of_rows, dtype=bool)
+        erased_rows = []
+    else:
+        erasures = np.asarray(erasures, dtype=bool)
+        decoded[erasures] = 0  # the erasures are set to 0, as in reedsolo
+        success = erasures.sum(axis=1) <= nsym  # too many erasures to correct
+        erased_rows = np.flatnonzero(erasures.any(axis=1))
+
+    dirty = rs_calc_syndromes_batch(decoded, nsym, c_exp).any(axis=1) & success
+    positions = bytearray if c_exp <= 8 else list  # the type reedsolo returns the positions in
+    errata = [positions() for _ in range(num_of_rows)]
+    for i in erased_rows:
+        errata[i] = positions(np.flatnonzero(erasures[i]).tolist())
+    if erasures is not None:
+        # the codewords with erasures are first filled as if they have no errors,
+        # only the ones that are still not codewords need to locate errors
+        rows = np.flatnonzero(dirty & erasures.any(axis=1))
+        filled, _ = rs_erasure_decode_batch(decoded[rows], nsym, erasures[rows], c_exp)
+        clean = ~rs_calc_syndromes_batch(filled, nsym, c_exp).any(axis=1)
+        decoded[rows[clean]] = filled[clean]
+        dirty[rows[clean]] = False
+
+    rows = np.flatnonzero(dirty)
+    corrected, corrected_success, corrected_errata = rs_correct_batch(
+        decoded[rows], nsym, None if erasures is None else erasures[rows], c_exp)
+    decoded[rows[corrected_success]] = corrected[corrected_success]
+    success[rows[~corrected_success]] = False
+    for i, row_errata in zip(rows, corrected_errata):
+        errata[i] = row_errata
+
+    failed = np.flatnonzero(~success)
+    decoded[failed] = received[failed]
+    for i in failed:
+        errata[i] = None
+    return decoded, success, errata
+
+
+def gf_solve_batch(matrices, rhs, c_exp=8):
+    """
+    This function solves the systems matrices[r] x = rhs[r] over GF(2^c_exp) with Gauss-Jordan elimination,
+    all at once. There is no pivoting, so all the leading principal minors must be invertible,
+    as in Vandermonde matrices
+    :param matrices: array of shape (systems, size, size)
+    :param rhs: array of shape (systems, size)
+    :param c_exp: the exponent of the field
+    :return: the solutions, of shape (systems, size)
+    """
+    gf = field(c_exp)
+    matrices = np.array(matrices, dtype=gf.dtype)
+    solutions = np.array(rhs, dtype=gf.dtype)
+    for col in range(matrices.shape[-1]):
+        # normalize the pivot row
+        inverse = gf.inv[matrices[:, col, col]]
+        matrices[:, col] = gf.mul(inverse[:, None], matrices[:, col])
+        solutions[:, col] = gf.mul(inverse, solutions[:, col])
+        # eliminate the column from the other rows
+        factors = matrices[:, :, col].copy()
+        factors[:, col] = 0
+        matrices ^= gf.mul(factors[:, :, None], matrices[:, None, col])
+        solutions ^= gf.mul(factors, solutions[:, col, None])
+    return solutions
+
+
+def rs_erasure_decode_batch(codewords, nsym, erasures, c_exp=8):
+    """
+    This function fills the erasures of all the codewords at once, when there are no errors.
+    The values of the erased positions solve the syndrome equations, a Vandermonde system of the size of the
+    number of erasures, so there is no error location. Codewords without erasures are not touched
+    :param codewords: matrix of the codewords, one codeword in each row
+    :param nsym: the number of ecc symbols
+    :param erasures: boolean matrix of the erased positions in each codeword
+    :param c_exp: the exponent of the field
+    :return: decoded - the codewords with the erasures filled,
+                       the codewords with more than nsym erasures are returned as received
+             success - boolean array, whether the erasures of each codeword were filled
+    """
+    decoded = np.array(codewords, dtype=symbol_dtype(c_exp))
+    erasures = np.asarray(erasures, dtype=bool)
+    counts = erasures.sum(axis=1)
+    success = counts <= nsym
+    matrix = syndrome_matrix(decoded.shape[-1], nsym, c_exp)
+    for count in np.unique(counts[(counts > 0) & success]):
+        # the codewords with the same number of erasures are solved together
+        rows = np.flatnonzero(counts == count)
+        positions = np.nonzero(erasures[rows])[1].reshape(len(rows), count)
+        words = decoded[rows]
+        words[erasures[rows]] = 0
+        syndromes = gf_matmul(words, matrix[:, :count], c_exp)
+        # the syndrome i of the erased values e_j is the sum of e_j * 2^(i*(length-1-position_j))
+        systems = matrix[positions, :count].transpose(0, 2, 1)
+        words[np.arange(len(rows))[:, None], positions] = gf_solve_batch(systems, syndromes, c_exp)
+        decoded[rows] = words
+    return decoded, success
@@ -0,0 +1,157 @@
+import struct
+from codec_plan import get_plan
+from codeword import Codeword
+from codeword_file import params_dtype
+from main_code import linear_decode, linear_encode
+
+MAGIC = b'LTCS'
+FORMAT_VERSION = 1
+# magic, format version, the parameters (pr, qr, pe, qe, b, r, epsilon, k)
+HEADER = struct.Struct('<4sHIIIIIddQ')
+FRAME_HEADER = struct.Struct('<Q')  # the number of message bytes in the frame
+
+
+def read_exactly(reader, size):
+    """
+    This function reads exactly size bytes, or less if the stream ended
+    :param reader: binary stream
+    :param size: the number of bytes to read
+    :return: the bytes read
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = reader.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def iter_frames(reader, k):
+    """
+    This function splits a stream into frames of k bytes, only one frame is in memory at a time
+    :param reader: binary stream
+    :param k: the size of each frame, the last frame may be shorter
+    :return: generator of the frames
+    """
+    while True:
+        frame = read_exactly(reader, k)
+        if not frame:
+            return
+        yield frame
+        if len(frame) < k:
+            return
+
+
+def encode_frames(frames, params, ramanujan_graph=None, expander_graph=None):
+    """
+    This function encodes each of the frames with the same parameters, the graphs are built only once
+    :param frames: iterable of messages of at most k bytes
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :param ramanujan_graph: Optional pre-initialized Ramanujan graph
+    :param expander_graph: Optional pre-initialized expander graph
+    :return: generator of the length of each frame and its codeword
+    """
+    pr, qr, pe, qe, b, r, epsilon, k = params
+    if ramanujan_graph is None or expander_graph is None:
+        plan = get_plan(params)
+        ramanujan_graph, expander_graph = plan.ramanujan, plan.expander
+    for frame in frames:
+        message = bytearray(frame) + bytearray(k - len(frame))  # pad the last frame
+        yield len(frame), linear_encode(message, pr, qr, pe, qe, b, epsilon, ramanujan_graph, expander_graph)
+
+
+def decode_frames(codewords, params, ramanujan_graph=None, expander_graph=None, workers=1):
+    """
+    This function decodes each of the frames with the same parameters, the graphs are built only once
+    :param codewords: iterable of the length of each frame and its codeword
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :param ramanujan_graph: Optional pre-initialized Ramanujan graph
+    :param expander_graph: Optional pre-initialized expander graph
+    :param workers: Optional number of processes for the block decoding
+    :return: generator of the message of each frame and a flag if we think it was decoded successfully
+    """
+    pr, qr, pe, qe, b, r, epsilon, k = params
+    if ramanujan_graph is None or expander_graph is None:
+        plan = get_plan(params)
+        ramanujan_graph, expander_graph = plan.ramanujan, plan.expander
+    for length, codeword in codewords:
+        word, flag = linear_decode(codeword, pr, qr, pe, qe, b, epsilon, ramanujan_graph, expander_graph,
+                                   workers=workers)
+        yield word[:length], flag
+
+
+def encode_stream(reader, writer, params, ramanujan_graph=None, expander_graph=None):
+    """
+    This function encodes a stream of any length into a framed container.
+    The container starts with a header of the parameters, and each frame is the length of its message
+    followed by the n x delta symbols of its codeword
+    :param reader: binary stream of the message
+    :param writer: binary stream for the container
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :param ramanujan_graph: Optional pre-initialized Ramanujan graph
+    :param expander_graph: Optional pre-initialized expander graph
+    :return: the number of frames
+    """
+    writer.write(HEADER.pack(MAGIC, FORMAT_VERSION, *params))
+    num_of_frames = 0
+    for length, codeword in encode_frames(iter_frames(reader, params[-1]), params, ramanujan_graph, expander_graph):
+        writer.write(FRAME_HEADER.pack(length))
+        writer.write(codeword)  # the codeword is a contiguous buffer
+        num_of_frames += 1
+    return num_of_frames
+
+
+def read_header(reader):
+    """
+    This function reads the header of a framed container
+    :param reader: binary stream of the container
+    :return: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    """
+    header = read_exactly(reader, HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("The stream is too short for a container header")
+    magic, version, *params = HEADER.unpack(header)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("The stream is not a container of version %i" % FORMAT_VERSION)
+    return tuple(params)
+
+
+def iter_codewords(reader, params):
+    """
+    This function reads the frames of a container one at a time
+    :param reader: binary stream of the container, after the header
+    :param params: the parameters of the code (pr, qr, pe, qe, b, r, epsilon, k)
+    :return: generator of the length of each frame and its codeword
+    """
+    qe, delta = params[3], params[2] + 1
+    n = qe * (qe * qe - 1) // 2  # number of blocks
+    dtype = params_dtype(params)
+    size = n * delta * dtype.itemsize  # the bytes of a codeword
+    while True:
+        frame_header = read_exactly(reader, FRAME_HEADER.size)
+        if not frame_header:
+            return
+        symbols = read_exactly(reader, size)
+        if len(frame_header) < FRAME_HEADER.size or len(symbols) < size:
+            raise ValueError("The container ends in the middle of a frame")
+        yield FRAME_HEADER.unpack(frame_header)[0], Codeword(symbols, delta, dtype)
+
+
+def decode_stream(reader, writer, ramanujan_graph=None, expander_graph=None, workers=1):
+    """
+    This function decodes a framed container into a stream, one frame at a time
+    :param reader: binary stream of the container
+    :param writer: binary stream for the message
+    :param ramanujan_graph: Optional pre-initialized Ramanujan graph
+    :param expander_graph: Optional pre-initialized expander graph
+    :param workers: Optional number of processes for the block decoding
+    :return: a flag for each frame if we think it was decoded successfully
+    """
+    params = read_header(reader)
+    flags = []
+    for word, flag in decode_frames(iter_codewords(reader, params), params, ramanujan_graph, expander_graph,
+                                    workers):
+        writer.write(word)
+        flags.append(flag)
+    return flags